@@ -0,0 +1,100 @@
+"""Scaling benchmark for ``pypcb.erc.check``.
+
+Runs the array-based ERC on synthetic boards of increasing size, next to
+the kind of Python loop over ``get_nets()`` it replaces. The netlist IR is
+built once per board (``ir``) and is not part of the ``erc`` time::
+
+    python benchmarks/erc.py
+    python benchmarks/erc.py --sizes 1000 10000 100000 1000000
+"""
+import argparse
+import random
+import time
+
+from pypcb import Circuit, Component
+from pypcb.ast import Pad
+from pypcb.erc import check
+
+
+class Part(Component):
+    REF = 'U'
+    PINOUT = (('1', 'vcc'), ('2', 'gnd'), ('3', 'a'), ('4', 'b'))
+    POWER_PADS = ('vcc', 'gnd')
+
+
+def make_board(n_pads, fanout=8, seed=0):
+    """Board of ``n_pads // 4`` parts wired in groups of up to ``fanout`` pads.
+
+    About 0.1% of the signal pads are left unconnected, alone on their net
+    or on a net with two names, so every rule has violations to report.
+    """
+    rng = random.Random(seed)
+    board = Circuit()
+    parts = [Part(name=f'u{i}') for i in range(max(n_pads // 4, 1))]
+    board.connections += [(part.vcc, 'VCC') for part in parts]
+    board.connections += [(part.gnd, 'GND') for part in parts]
+    pads = [
+        getattr(part, name) for part in parts for name in ('a', 'b')
+        if rng.random() > 0.001
+    ]
+    connections = []
+    start = 0
+    while start < len(pads):
+        size = 1 if rng.random() < 0.001 else rng.randrange(2, fanout + 1)
+        group = pads[start:start + size]
+        if rng.random() < 0.001:
+            group = group + [f'N{start}', f'M{start}']
+        connections.append(tuple(group))
+        start += size
+    board.connections += connections
+    return board
+
+
+def loop_check(circuit):
+    # The ad-hoc checks: one pass over the nets, one over every pad
+    violations = []
+    connected = set()
+    for net in circuit.get_nets():
+        pads = [member for member in net if isinstance(member, Pad)]
+        names = set(member for member in net if isinstance(member, str))
+        if len(pads) == 1:
+            violations.append(('single-pad-net', net))
+        if len(names) > 1:
+            violations.append(('shorted-names', net))
+        connected.update(pads)
+    for component in circuit.get_components():
+        for name in component._pads:
+            pad = component._pads[name]
+            if pad not in connected:
+                violations.append(('unconnected-pad', pad))
+                if name in component.POWER_PADS:
+                    violations.append(('floating-power', pad))
+    return violations
+
+
+def timeit(function, *args, **kwargs):
+    start = time.perf_counter()
+    result = function(*args, **kwargs)
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000])
+    args = parser.parse_args()
+
+    print(f'{"pads":>10} {"violations":>10} {"ir":>9} {"erc":>9} {"loop":>9}')
+    for size in args.sizes:
+        board = make_board(size)
+        board.get_nets()
+        ir_elapsed, netlist = timeit(board.build, ir=True)
+        elapsed, violations = timeit(check, netlist)
+        loop_elapsed, loop_violations = timeit(loop_check, board)
+        print(
+            f'{size:>10} {len(violations):>10} {ir_elapsed:8.3f}s {elapsed:8.3f}s'
+            f' {loop_elapsed:8.3f}s'
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,120 @@
+"""Scaling benchmark for ``Circuit.get_nets``.
+
+Compares the union-find net engine against the fixpoint ``reduce`` that
+``get_nets`` used before, on synthetic circuits from 1k to 1M connections::
+
+    python benchmarks/net_resolution.py
+    python benchmarks/net_resolution.py --sizes 1000 10000 --legacy-max 10000
+"""
+import argparse
+import random
+import time
+
+from pypcb import Net, Circuit
+from pypcb.ast import Pad
+
+
+def legacy_get_nets(circuit, clean_nets=True):
+    def reduce(netlist):
+        new_netlist = []
+        reduced = False
+
+        def get_net_index(net):
+            for i, n in enumerate(new_netlist):
+                if net in n:
+                    return i
+            return None
+
+        for nets in netlist:
+            for net in nets:
+                idx = get_net_index(net)
+                if idx is not None:
+                    break
+            if idx is None:
+                new_netlist.append(nets)
+            else:
+                new_netlist[idx] += nets
+                reduced = True
+        return new_netlist, reduced
+
+    nets = list(circuit.connections)
+    for circuit_name, subcircuit in circuit.subcircuits:
+        nets += legacy_get_nets(subcircuit, clean_nets=False)
+
+    netlist, reduced = reduce(nets)
+    while reduced:
+        netlist, reduced = reduce(netlist)
+
+    if clean_nets:
+        netlist = [
+            tuple(set(n for n in node if isinstance(n, (Pad, str))))
+            for node in netlist
+        ]
+    return netlist
+
+
+def make_connections(n_connections, fanout=8, seed=0):
+    """Draw ``n_connections`` two-member connections.
+
+    Connections are drawn inside blocks of ``fanout`` members, so the result
+    has many small nets like a real board rather than one giant net.
+    """
+    rng = random.Random(seed)
+    n_members = max(n_connections * 2 // fanout, 1) * fanout
+    members = [Net(name=f'n{i}') for i in range(n_members)]
+    connections = []
+    for i in range(n_connections):
+        block = rng.randrange(n_members // fanout) * fanout
+        connections.append((
+            members[block + rng.randrange(fanout)],
+            members[block + rng.randrange(fanout)],
+        ))
+    return connections
+
+
+def make_circuit(connections):
+    """Spread ``connections`` over a board and 16 subcircuits."""
+    board = Circuit()
+    subcircuits = [Circuit() for i in range(16)]
+    for i, circuit in enumerate(subcircuits):
+        board.subcircuits[f'sub{i}'] = circuit
+
+    for i, connection in enumerate(connections):
+        target = board if i % 17 == 0 else subcircuits[i % 16]
+        target.connections += connection
+    return board
+
+
+def timeit(function, *args, **kwargs):
+    start = time.perf_counter()
+    result = function(*args, **kwargs)
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', type=int, nargs='+',
+                        default=[1000, 10000, 100000, 1000000])
+    parser.add_argument('--legacy-max', type=int, default=10000,
+                        help='Largest size the legacy algorithm is run on')
+    args = parser.parse_args()
+
+    # The union-find work happens while connections are added, so it is
+    # timed together with the final get_nets() call.
+    print(f'{"connections":>12} {"nets":>8} {"union-find":>12} {"legacy":>12}')
+    for size in args.sizes:
+        connections = make_connections(size)
+        build_elapsed, circuit = timeit(make_circuit, connections)
+        elapsed, netlist = timeit(circuit.get_nets)
+        elapsed += build_elapsed
+        if size <= args.legacy_max:
+            legacy_elapsed, legacy = timeit(legacy_get_nets, circuit)
+            assert len(netlist) == len(legacy)
+            legacy_elapsed = f'{legacy_elapsed:11.3f}s'
+        else:
+            legacy_elapsed = f'{"skipped":>12}'
+        print(f'{size:>12} {len(netlist):>8} {elapsed:11.3f}s {legacy_elapsed}')
+
+
+if __name__ == '__main__':
+    main()
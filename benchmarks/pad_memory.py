@@ -0,0 +1,122 @@
+"""Memory benchmark for pads.
+
+Reports bytes per pad of components built pad by pad with ``add_pad``, in
+bulk with ``add_pads`` (with and without every pad being accessed) and of
+2-pad resistors with both pads accessed. ``--baseline REV`` also measures
+the ``pypcb`` of git revision ``REV``, e.g. the one before the pads moved
+to ``Component._pads``; layouts it has no API for are skipped::
+
+    python benchmarks/pad_memory.py
+    python benchmarks/pad_memory.py --components 200 --pins 1000
+    python benchmarks/pad_memory.py --baseline f86563c
+"""
+import argparse
+import io
+import os
+import subprocess
+import sys
+import tarfile
+import tempfile
+import time
+import tracemalloc
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def add_pads(component, pins):
+    for pin, name in pins:
+        component.add_pad(pin, name)
+
+
+def add_pads_bulk(component, pins):
+    component.add_pads(pins)
+
+
+def add_pads_bulk_used(component, pins):
+    component.add_pads(pins)
+    for pin, name in pins:
+        getattr(component, name)
+
+
+def measure(make, n):
+    # Bytes still allocated after building ``n`` objects
+    make(0)
+    tracemalloc.start()
+    start = time.perf_counter()
+    objects = [make(i) for i in range(n)]
+    elapsed = time.perf_counter() - start
+    size, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del objects
+    return size, elapsed
+
+
+def run(args):
+    from pypcb import Component
+    from pypcb.lib.generic import Resistor
+
+    # Pin and pad names are created up front so only the pads are measured
+    pins = tuple((f'{i + 1}', f'p{i + 1}') for i in range(args.pins))
+
+    def components(add):
+        def make(i):
+            component = Component(name=f'u{i}')
+            add(component, pins)
+            return component
+        return make
+
+    def resistor(i):
+        component = Resistor(1e3, name=f'r{i}')
+        component.p1, component.p2
+        return component
+
+    n_pads = args.components * args.pins
+    print(f'{n_pads} pads ({args.components} components x {args.pins} pins)')
+    print(f'{"layout":>20} {"bytes/pad":>10} {"time":>10}')
+    layouts = [('add_pad', components(add_pads), args.components, args.pins)]
+    if hasattr(Component, 'add_pads'):
+        layouts += [
+            ('add_pads', components(add_pads_bulk), args.components, args.pins),
+            ('add_pads, all used', components(add_pads_bulk_used), args.components, args.pins),
+        ]
+    layouts.append(('Resistor, both used', resistor, n_pads // 2, 2))
+    for label, make, n, n_pins in layouts:
+        size, elapsed = measure(make, n)
+        print(f'{label:>20} {size / (n * n_pins):10.1f} {elapsed:9.3f}s')
+
+
+def run_baseline(args):
+    # Runs this script on the pypcb package of the revision
+    archive = subprocess.run(
+        ['git', 'archive', '--format=tar', args.baseline, 'pypcb'],
+        cwd=ROOT, check=True, capture_output=True,
+    ).stdout
+    with tempfile.TemporaryDirectory() as path:
+        with tarfile.open(fileobj=io.BytesIO(archive)) as tar:
+            tar.extractall(path)
+        subprocess.run([
+            sys.executable, __file__, '--path', path,
+            '--components', str(args.components), '--pins', str(args.pins),
+        ], check=True)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--components', type=int, default=100)
+    parser.add_argument('--pins', type=int, default=1000)
+    parser.add_argument('--baseline', help='also measure the pypcb of this git revision')
+    parser.add_argument('--path', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    sys.path.insert(0, args.path or ROOT)
+    if args.baseline:
+        print(f'baseline ({args.baseline}):')
+        run_baseline(args)
+        print()
+        print('current:')
+    run(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,8 +1,9 @@
 import argparse
 import os
+import pathlib
 from pypcb import Net, Circuit, Board
 from pypcb.lib.generic import Transistor, Resistor, Capacitor, Connector
-from pypcb.back.kicad import generate_netlist, read_netlist
+from pypcb.back.kicad import generate_netlist, read_components_map
 
 
 class BC548(Transistor):
@@ -90,11 +91,7 @@ def main():
     myboard = MyBoard()
     components_map = None
     if os.path.exists(args.file):
-        with open(args.file) as f:
-            netlist = read_netlist(f.read())
-        components_map = {}
-        for c in netlist['export']['components']:
-            components_map[c['hierarchy']] = c['ref']
+        components_map = read_components_map(pathlib.Path(args.file))
 
     netlist = generate_netlist(
         myboard,
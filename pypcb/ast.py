@@ -1,5 +1,9 @@
 from . import tracer
-from collections.abc import Iterable
+from collections.abc import Iterable, Mapping
+from functools import lru_cache
+import hashlib
+import marshal
+from types import MappingProxyType
 
 
 class ConnectionsMannager:
@@ -18,13 +22,17 @@ class ConnectionsMannager:
             for connection in connections:
                 if self.isvalid(*connection):
                     self._connections.append(connection)
+                    self.circuit._connect(connection)
                     for net in connection:
                         if isinstance(net, Pad):
                             net._connected = True
                             if not net._owner._owner:
                                 self.circuit.components += net._owner
+                        elif isinstance(net, Net) and net._circuit is None:
+                            net._circuit = self.circuit
                 else:
                     raise ValueError(f'{connection}')
+            self.circuit._touch()
             return self
 
     def __iter__(self):
@@ -50,6 +58,7 @@ class ComponentsMannager:
 
             self._components[component.name] = component
             component._owner = self.circuit
+        self.circuit._touch()
         return self
 
     def __iter__(self):
@@ -66,26 +75,281 @@ class CircuitMannager:
             raise ValueError(f"{circuit} must be a Circuit")
         if field in self._circuits:
             raise ValueError(f"{field} already in use")
+        if circuit._owner is not None:
+            raise ValueError(f"{circuit} is already a subcircuit")
 
         self._circuits[field] = circuit
+        circuit._owner = self.cicuit
+        circuit._name = field
+        # Only the root keeps a live union-find: the subcircuit's is merged
+        # into it, the smaller one into the larger.
+        root = self.cicuit._get_root()
+        nets, other = root._nets, circuit._nets
+        if len(other) > len(nets):
+            nets, other = other, nets
+        nets.update(other)
+        root._nets = nets
+        circuit._nets = None
+        self.cicuit._touch()
 
     def __iter__(self):
         return iter(self._circuits.items())
 
 
+class DisjointSet:
+    """Union-find over net members (``Net``, ``Pad`` and ``str`` names).
+
+    Uses path compression and union by rank, so merging ``n`` connections
+    is near-linear. Each root also keeps the list of its members, so
+    ``members()`` is O(k) in the size of the net.
+    """
+
+    def __init__(self):
+        self._parent = {}
+        self._rank = {}
+        self._members = {}
+
+    def __contains__(self, member):
+        return member in self._parent
+
+    def __len__(self):
+        return len(self._parent)
+
+    def add(self, member):
+        if member not in self._parent:
+            self._parent[member] = member
+            self._rank[member] = 0
+            self._members[member] = [member]
+
+    def find(self, member):
+        parent = self._parent
+        root = member
+        while parent[root] is not root:
+            root = parent[root]
+        while parent[member] is not root:
+            parent[member], member = root, parent[member]
+        return root
+
+    def union(self, *members):
+        parent = self._parent
+        rank = self._rank
+        nets = self._members
+        root = None
+        for member in members:
+            if member not in parent:
+                parent[member] = member
+                rank[member] = 0
+                nets[member] = [member]
+            other = self.find(member)
+            if root is None or other is root:
+                root = other
+                continue
+            if rank[root] < rank[other]:
+                root, other = other, root
+            parent[other] = root
+            if rank[root] == rank[other]:
+                rank[root] += 1
+            small, large = nets.pop(other), nets[root]
+            if len(small) > len(large):
+                small, large = large, small
+                nets[root] = large
+            large.extend(small)
+        return root
+
+    def members(self, member):
+        return tuple(self._members[self.find(member)])
+
+    def nets(self):
+        return [tuple(members) for members in self._members.values()]
+
+    def update(self, other):
+        """Merge the nets of the disjoint set ``other`` into this one."""
+        parent = self._parent
+        for members in other._members.values():
+            if any(member in parent for member in members):
+                self.union(*members)
+                continue
+            # A net new to this set is added as a flat tree
+            root = members[0]
+            for member in members:
+                parent[member] = root
+                self._rank[member] = 0
+            self._rank[root] = 1 if len(members) > 1 else 0
+            self._members[root] = list(members)
+
+    def __getstate__(self):
+        # Pickled as its nets only; the trees are rebuilt flat
+        return self.nets()
+
+    def __setstate__(self, nets):
+        self._parent = {}
+        self._rank = {}
+        self._members = {}
+        for net in nets:
+            root = net[0]
+            for member in net:
+                self._parent[member] = root
+                self._rank[member] = 0
+            self._rank[root] = 1 if len(net) > 1 else 0
+            self._members[root] = list(net)
+
+
+def _build_pinout(pins, names):
+    if names is None:
+        return {name: pin for pin, name in pins}
+    return {names.format(pin): str(pin) for pin in pins}
+
+
+_cached_pinout = lru_cache(maxsize=1024)(_build_pinout)
+
+# Component fields exported to the netlists
+_FIELDS = ('value', 'footprint', 'spice_name', 'spice_model')
+# Component attributes covered by Circuit.fingerprint()
+_HASHED_FIELDS = ('REF',) + _FIELDS
+
+
+@lru_cache(maxsize=1024)
+def _get_class_token(component_class):
+    # Returns the token of a component class and the fields it computes
+    # (descriptors), which are read from each instance instead
+    fields = []
+    computed = []
+    for name in _HASHED_FIELDS:
+        value = getattr(component_class, name, None)
+        if hasattr(type(value), '__get__'):
+            computed.append(name)
+        else:
+            fields.append((name, value))
+    token = repr((component_class.__module__, component_class.__qualname__, fields))
+    return token, tuple(computed)
+
+
+def get_pinout(pins, names=None):
+    """Return a ``{pad name: pin}`` table.
+
+    ``pins`` is an iterable of ``(pin, name)`` pairs or, if ``names`` is a
+    format string, an iterable of pin numbers (e.g. ``range(1, 41)`` with
+    ``'p{}'``). Tables built from hashable arguments are cached and shared,
+    so they must not be modified.
+    """
+    try:
+        return _cached_pinout(pins, names)
+    except TypeError:
+        return _build_pinout(pins, names)
+
+
+class PadTable(Mapping):
+    """Pads of a component by name.
+
+    Pads added in bulk from a pinout are only created when first accessed.
+    The pinout table is shared with other components until a pad is added
+    one by one.
+    """
+
+    __slots__ = ('_owner', '_pins', '_pads', '_shared')
+
+    def __init__(self, owner):
+        self._owner = owner
+        self._pins = {}
+        self._pads = {}
+        self._shared = False
+
+    def _unshare(self):
+        if self._shared:
+            self._pins = dict(self._pins)
+            self._shared = False
+
+    def add(self, pin, name):
+        self._unshare()
+        self._pins[name] = pin
+        pad = self._pads[name] = Pad(self._owner, name)
+        return pad
+
+    def update(self, pinout):
+        if not self._pins:
+            self._pins = pinout
+            self._shared = True
+        else:
+            self._unshare()
+            self._pins.update(pinout)
+        if self._pads:
+            for name in pinout:
+                self._pads.pop(name, None)
+
+    def __getitem__(self, name):
+        pad = self._pads.get(name)
+        if pad is None:
+            if name not in self._pins:
+                raise KeyError(name)
+            pad = self._pads[name] = Pad(self._owner, name)
+        return pad
+
+    def __contains__(self, name):
+        return name in self._pins
+
+    def __iter__(self):
+        return iter(self._pins)
+
+    def __len__(self):
+        return len(self._pins)
+
+
 class Component:
+    # Pinout as data: (pin, name) pairs added as pads by __init__
+    PINOUT = None
+    # Names of the pads that must not be left floating (checked by the ERC)
+    POWER_PADS = ()
+
     def __init__(self, *, name=None, src_loc_at=0):
-        self.src_loc = tracer.get_src_loc(1 + src_loc_at)
+        self.src_loc = tracer.get_src_loc(src_loc_at)
         if name is not None and not isinstance(name, str):
             raise TypeError("Name must be a string, not {!r}".format(name))
         self.name = name or tracer.get_var_name(depth=2 + src_loc_at)
         self._owner = None
-        self._pads = []
+        self._pads = PadTable(self)
+        if self.PINOUT is not None:
+            self.add_pads(self.PINOUT)
 
     def add_pad(self, pin, name):
-        pad = Pad(self, name=name, pin=pin)
-        setattr(self, name, pad)
-        self._pads.append(pad)
+        self._pads.add(pin, name)
+        self._touch_owner()
+
+    def add_pads(self, pins, names=None):
+        """Add all the pads of a pinout at once.
+
+        Takes the same arguments as ``get_pinout``, e.g.
+        ``add_pads([('1', 'b'), ('2', 'c'), ('3', 'e')])`` or
+        ``add_pads(range(1, n + 1), 'p{}')``.
+        """
+        self._pads.update(get_pinout(pins, names))
+        self._touch_owner()
+
+    def _touch_owner(self):
+        # The pinout and the fields are part of the fingerprint of the owner
+        try:
+            owner = self._owner
+        except AttributeError:
+            return
+        if owner is not None:
+            owner._touch()
+
+    def __getattr__(self, name):
+        # Pads are only stored in _pads and looked up here, so component.p1
+        # works without an instance attribute per pad. Going through
+        # __dict__ would give every component a dict of its own.
+        if name == '_pads':
+            raise AttributeError(name)
+        try:
+            return self._pads[name]
+        except KeyError:
+            raise AttributeError(
+                f'{type(self).__name__!r} object has no attribute {name!r}'
+            ) from None
+
+    def __setattr__(self, name, value):
+        object.__setattr__(self, name, value)
+        if name in _HASHED_FIELDS:
+            self._touch_owner()
 
     def __str__(self):
         return self.name
@@ -94,64 +358,260 @@ class Component:
 class Circuit:
     def __init__(self):
         self._owner = None
+        self._name = None
+        self._nets = DisjointSet()
+        self._version = 0
+        self._cache = {}
+        # Netlist fragments by fingerprint, from the last Netlist.from_circuit
+        self._fragments = {}
         self.connections = ConnectionsMannager(self)
         self.components = ComponentsMannager(self)
         self.subcircuits = CircuitMannager(self)
 
-    def get_nets(self, clean_nets=True):
-        def reduce(netlist):
-            new_netlist = []
-            reduced = False
-
-            def get_net_index(net):
-                for i, n in enumerate(new_netlist):
-                    if net in n:
-                        return i
-                return None
+    def _get_root(self):
+        circuit = self
+        while circuit._owner is not None:
+            circuit = circuit._owner
+        return circuit
+
+    def _connect(self, connection):
+        # New connections go to the live union-find of the root
+        self._get_root()._nets.union(*connection)
+
+    def _get_disjoint_set(self):
+        # The root's union-find is live; a subcircuit's view of its subtree
+        # is built from its connections when first queried after a change.
+        if self._nets is not None:
+            return self._nets
+        return self._cached('disjoint_set', self._build_disjoint_set)
+
+    def _build_disjoint_set(self):
+        nets = DisjointSet()
+        for connection in self._iter_connections():
+            nets.union(*connection)
+        return nets
+
+    def __getstate__(self):
+        # Cached results are not pickled (and may not be picklable)
+        state = self.__dict__.copy()
+        state['_cache'] = {}
+        state['_fragments'] = {}
+        return state
+
+    def _touch(self):
+        # Bump the version of this circuit and its ancestors, which drops
+        # their cached results. Siblings keep theirs.
+        circuit = self
+        while circuit is not None:
+            circuit._version += 1
+            circuit = circuit._owner
+
+    def _cached(self, key, compute):
+        version, value = self._cache.get(key, (None, None))
+        if version != self._version:
+            value = compute()
+            self._cache[key] = (self._version, value)
+        return value
+
+    def _iter_connections(self):
+        yield from self.connections
+        for circuit_name, circuit in self.subcircuits:
+            yield from circuit._iter_connections()
 
-            for nets in netlist:
-                for net in nets:
-                    idx = get_net_index(net)
-                    if idx is not None:
-                        break
-                if idx is None:
-                    new_netlist.append(nets)
-                else:
-                    new_netlist[idx] += nets
-                    reduced = True
-            return new_netlist, reduced
-
-        def do_clean_nets(netlist):
-            return [
-                tuple(set(n for n in node if isinstance(n, (Pad, str))))
-                for node in netlist
-            ]
+    @staticmethod
+    def _clean_net(net):
+        return tuple(n for n in net if isinstance(n, (Pad, str)))
 
-        nets = list(self.connections)
-        for circuit_name, circuit in self.subcircuits:
-            nets += circuit.get_nets(clean_nets=False)
+    def get_net(self, member, clean_nets=True):
+        """Return the members of the net ``member`` belongs to.
 
-        netlist, reduced = reduce(nets)
-        while reduced:
-            netlist, reduced = reduce(netlist)
+        ``member`` can be a ``Pad``, a ``Net`` or a net name. Raises
+        ``KeyError`` if it is not connected anywhere in this circuit.
+        """
+        net = self._get_disjoint_set().members(member)
+        if clean_nets:
+            net = self._clean_net(net)
+        return net
 
+    def get_nets(self, clean_nets=True):
+        return list(self._cached(('nets', clean_nets), lambda: self._get_nets(clean_nets)))
+
+    def _get_nets(self, clean_nets):
+        nets = self._get_disjoint_set()
+        roots = {}
+        for connection in self._iter_connections():
+            if connection:
+                root = nets.find(connection[0])
+                if root not in roots:
+                    roots[root] = nets.members(root)
+
+        netlist = list(roots.values())
         if clean_nets:
-            netlist = do_clean_nets(netlist)
+            netlist = [self._clean_net(net) for net in netlist]
         return netlist
 
     def get_components(self):
-        components = {
-            component: '/' + name for name, component in self.components
-        }
+        """Return a read-only ``{component: hierarchy path}`` mapping.
+
+        The result is cached until this circuit or one of its subcircuits
+        changes, so repeated calls on an unchanged board are free.
+        """
+        return self._cached('components', self._get_components)
+
+    def _get_components(self):
+        # One walk from this circuit, so each path is built once
+        components = {}
+        self._add_components(components, '/')
+        return MappingProxyType(components)
+
+    def _add_components(self, components, prefix):
+        for name, component in self.components:
+            components[component] = prefix + name
         for circuit_name, circuit in self.subcircuits:
-            subcircuit_components = circuit.get_components()
-            components.update({
-                component: '/' + circuit_name + name
-                for component, name in subcircuit_components.items()
-            })
-        return components
-
-    def build(self):
+            circuit._add_components(components, prefix + circuit_name + '/')
+
+    def fingerprint(self):
+        """Return a digest of the structure of this circuit.
+
+        Two circuits have the same fingerprint when they have the same
+        components (class, name, value, footprint, SPICE model, source
+        location and pins), subcircuits and connections, whatever the
+        identity of their nets and pads. Their ``_get_members()`` are then in
+        matching order, so anything computed for one of them can be stamped
+        out for the other.
+
+        Only this circuit's own components and connections are hashed, with
+        the fingerprints of its subcircuits, so after a change only the
+        changed circuit and its ancestors are hashed again.
+        """
+        return self._get_structure()[0]
+
+    def _get_members(self):
+        # Every net member of the subtree but names, by first appearance in
+        # _iter_connections()
+        return self._cached('members', lambda: tuple(dict.fromkeys(
+            member
+            for connection in self._iter_connections()
+            for member in connection
+            if not isinstance(member, str)
+        )))
+
+    def _get_path(self, circuit):
+        # Subcircuit names from this circuit down to ``circuit``, None if it
+        # is not in the subtree
+        names = []
+        while circuit is not self:
+            if circuit is None:
+                return None
+            names.append(circuit._name)
+            circuit = circuit._owner
+        return tuple(reversed(names))
+
+    def _get_structure(self):
+        # Returns (digest, {net: index}, {member: index}): the nets first
+        # connected in this circuit and the members from outside of the
+        # subtree, each by first appearance
+        return self._cached('structure', self._build_structure)
+
+    def _build_structure(self):
+        nets = {}
+        externals = {}
+        # Classes, source files and pinouts are numbered, so the tokens of
+        # the components stay short
+        classes = {}
+        files = {}
+        pinouts = {}
+
+        def component_token(component):
+            component_class = type(component)
+            info = classes.get(component_class)
+            if info is None:
+                info = classes[component_class] = (len(classes),) + _get_class_token(component_class)
+            attributes = component.__dict__
+            pins = component._pads._pins
+            pinout = pinouts.get(id(pins))
+            if pinout is None:
+                pinout = pinouts[id(pins)] = (len(pinouts), repr(tuple(pins.items())))
+            src_file, src_line = component.src_loc or ('', 0)
+            token = [
+                info[0],
+                component.name,
+                files.setdefault(src_file, len(files)),
+                src_line,
+                pinout[0],
+            ]
+            token += [(name, repr(attributes[name])) for name in _HASHED_FIELDS if name in attributes]
+            if info[2]:
+                token += [repr(getattr(component, name)) for name in info[2]]
+            return token
+
+        # Structures of the subcircuits, for the members connected here
+        children = {circuit: circuit._get_structure() for circuit_name, circuit in self.subcircuits}
+
+        def member_token(member):
+            # A member of the subtree is named by the path to its circuit
+            # and its name or index there
+            if isinstance(member, str):
+                return member
+            if isinstance(member, Pad):
+                circuit = member._owner._owner
+                local = (member._owner.name, member.name)
+                if circuit is self:
+                    return ((), local)
+            else:
+                circuit = member._circuit
+                if circuit is self:
+                    return (nets.setdefault(member, len(nets)),)
+                structure = children.get(circuit)
+                if structure is not None:
+                    return ((circuit._name,), structure[1][member])
+                local = None
+            path = self._get_path(circuit)
+            if path is None:
+                return ('', externals.setdefault(member, len(externals)))
+            if local is None:
+                local = circuit._get_structure()[1][member]
+            return (path, local)
+
+        tokens = [[member_token(member) for member in connection] for connection in self.connections]
+        tokens.append([component_token(component) for name, component in self.components])
+        for circuit_name, circuit in self.subcircuits:
+            digest, circuit_nets, circuit_externals = children[circuit]
+            tokens.append((
+                circuit_name,
+                digest,
+                [member_token(member) for member in circuit_externals],
+            ))
+        tokens.append((
+            [info[1] for info in classes.values()],
+            list(files),
+            [pinout[1] for pinout in pinouts.values()],
+        ))
+
+        # marshal version 0 writes equal tokens alike (no references and no
+        # interned strings) and is much faster than repr
+        try:
+            data = marshal.dumps(tokens, 0)
+        except ValueError:
+            # Subcircuit names marshal can not write
+            data = b'r' + repr(tokens).encode('utf-8')
+        digest = hashlib.sha256(data).hexdigest()
+        return digest, nets, externals
+
+    def build(self, ir=False, index=False):
+        """Return ``(nets, components)``.
+
+        With ``ir`` returns a ``pypcb.ir.Netlist`` instead and with
+        ``index`` a ``pypcb.connectivity.Connectivity``.
+        """
+        if ir and index:
+            raise ValueError('ir and index are mutually exclusive')
+        if ir:
+            from .ir import Netlist
+            return Netlist.from_circuit(self)
+        if index:
+            from .connectivity import Connectivity
+            return Connectivity(self)
         return self.get_nets(), self.get_components()
 
 
@@ -160,23 +620,33 @@ class Board(Circuit):
 
 
 class Net:
+    # _circuit is the circuit that first connected the net
+    __slots__ = ('src_loc', 'name', '_connected', '_circuit')
+
     def __init__(self, *, name=None, src_loc_at=0):
-        self.src_loc = tracer.get_src_loc(1 + src_loc_at)
+        self.src_loc = tracer.get_src_loc(src_loc_at)
         if name is not None and not isinstance(name, str):
             raise TypeError("Name must be a string, not {!r}".format(name))
         self.name = name or tracer.get_var_name(depth=2 + src_loc_at, default='NET')
         self._connected = False
+        self._circuit = None
 
     def __repr__(self):
         return self.name + '@' + hex(id(self))
 
 
 class Pad(Net):
-    def __init__(self, owner, name, pin):
+    # The pin is read from the pinout of the owner rather than stored
+    __slots__ = ('_owner',)
+
+    def __init__(self, owner, name):
         self.name = name
-        self.pin = pin
         self._owner = owner
         self._connected = False
 
+    @property
+    def pin(self):
+        return self._owner._pads._pins[self.name]
+
     def __repr__(self):
         return str(self._owner) + '.' + self.name + '@' + hex(id(self))
@@ -1,119 +1,205 @@
-from ..ast import Net
-from textwrap import dedent
-import jinja2
+from ..ir import Netlist
+from .names import NameAllocator, RefAllocator
+import codecs
+from contextlib import contextmanager
+from itertools import chain
+import io
+import mmap
+import os
+import re
 
 
-def read_netlist(netlist):
-    assert netlist.count('(') == netlist.count(')')
-
-    def _check_brackets(brackets):
-        level = 0
-        for b in brackets:
-            if b[0] == '(':
-                level += 1
-            if b[0] == ')':
-                level -= 1
-            assert level >= 0
-
-    def _find_all(p, s):
-        def gen_find_all():
-            i = s.find(p)
-            while i != -1:
-                yield i
-                i = s.find(p, i + 1)
-        return list(gen_find_all())
-
-    def _get_name(start):
-        return netlist[start:netlist.find(' ', start)].replace('\n', '')
-
-    def _get_value(start, end):
-        return netlist[netlist.find(' ', start):end].lstrip().replace('"', '').replace('\n', '')
-
-    def _get_tree(brackets, is_list=False):
-        if is_list:
-            nodes = []
+_TOKEN = re.compile(r'"(?:[^"\\]|\\.)*"|[()]|[^\s()"]+|"', re.DOTALL)
+_ESCAPE = re.compile(r'\\(.)', re.DOTALL)
+_CHUNK_SIZE = 1 << 20
+_LIST_NODES = ('components', 'nets')
+
+
+@contextmanager
+def _open_netlist(netlist):
+    # A str is the netlist text, paths are only taken as os.PathLike
+    if isinstance(netlist, os.PathLike):
+        with open(netlist, 'rb') as f:
+            yield f
+    elif isinstance(netlist, str):
+        yield io.StringIO(netlist)
+    elif isinstance(netlist, (bytes, bytearray, memoryview)):
+        yield io.BytesIO(netlist)
+    else:
+        yield netlist
+
+
+def _iter_tokens(stream, chunk_size=_CHUNK_SIZE):
+    """Split an s-expression stream into lists of tokens, one per chunk.
+
+    ``stream`` is anything with a ``read(size)`` method returning ``str`` or
+    ``bytes`` (text/binary files, ``mmap``). Chunks are cut after the last
+    newline or ``)``, so no token is split; quoted atoms keep their quotes.
+    """
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    buffer = ''
+    while True:
+        data = stream.read(chunk_size)
+        eof = not data
+        chunk = data if isinstance(data, str) else decoder.decode(data, final=eof)
+        if eof:
+            tokens = _TOKEN.findall(buffer)
+            if '"' in tokens:
+                raise ValueError('Unterminated string in netlist')
+            yield tokens
+            return
+
+        buffer += chunk
+        cut = max(buffer.rfind('\n'), buffer.rfind(')')) + 1
+        tokens = _TOKEN.findall(buffer, 0, cut)
+        if '"' in tokens:
+            # A quoted atom spans the cut, wait for the rest of it
+            continue
+        buffer = buffer[cut:]
+        yield tokens
+
+
+def _atom(token):
+    if token[0] != '"':
+        return token
+    token = token[1:-1]
+    return _ESCAPE.sub(r'\1', token) if '\\' in token else token
+
+
+def _read_node(tokens, name=None):
+    # Reads the rest of a node whose '(' (and name, if given) was already
+    # consumed and returns its (name, value). Nodes with children become
+    # dicts (lists for components/nets, with every 'node' collected in
+    # 'nodes') and leaf nodes become the string of their atoms.
+    if name is None:
+        name = next(tokens, ')')
+    if name in ('(', ')'):
+        raise ValueError('Netlist node without a name')
+    is_list = name in _LIST_NODES
+    children = None
+    atoms = []
+    for token in tokens:
+        if token == '(':
+            child_name, child = _read_node(tokens)
+            if children is None:
+                children = [] if is_list else {}
+            if is_list:
+                children.append(child)
+            elif child_name == 'node':
+                children.setdefault('nodes', []).append(child)
+            else:
+                children[child_name] = child
+        elif token == ')':
+            break
         else:
-            nodes = {}
-        start = None
-        opened = 0
-
-        for i, (b, idx) in enumerate(brackets):
-            if b == '(':
-                opened += 1
-                if start is None:
-                    start = i
-            if b == ')':
-                opened -= 1
-                if opened == 0:
-                    end = i
-                    idx_start = brackets[start][1] + 1
-                    idx_end = idx
-                    name = _get_name(idx_start)
-
-                    if name == 'components' or name == 'nets':
-                        value = _get_tree(brackets[start + 1:end], is_list=True)
-                    elif name == 'node':
-                        if 'nodes' not in nodes:
-                            nodes['nodes'] = []
-                        nodes['nodes'].append(_get_tree(brackets[start + 1:end]))
-                        start = None
-                        continue
-                    elif end == start + 1:
-                        value = _get_value(idx_start, idx_end)
-                    else:
-                        value = _get_tree(brackets[start + 1:end])
-
-                    if is_list:
-                        nodes.append(value)
-                    else:
-                        nodes[name] = value
-                    start = None
-        return nodes
-
-    left_brackets = _find_all('(', netlist)
-    right_brackets = _find_all(')', netlist)
-    brackets = sorted(
-        [
-            *[('(', idx) for idx in left_brackets],
-            *[(')', idx) for idx in right_brackets]
-        ],
-        key=lambda x: x[1]
-    )
-    _check_brackets(brackets)
-    return _get_tree(brackets)
-
-
-class _Net:
-    def __init__(self, name, nodes):
-        self.nodes = nodes
-        self.name = name
-
-    def __iter__(self):
-        return iter(self.nodes)
+            atoms.append(_atom(token))
+    else:
+        raise ValueError(f'Unbalanced brackets in netlist node {name!r}')
 
+    if is_list:
+        return name, children or []
+    if name == 'node':
+        return name, children or {}
+    if children is None:
+        return name, ' '.join(atoms)
+    return name, children
 
-def generate_netlist(board, components_map=None):
-    board_components = board.get_components()
-    nets = board.get_nets()
-
-    components_type = set(c.REF for c in board_components.keys())
-    current = {t: 1 for t in components_type}
-    taken = []
-    taken_names = []
-
-    def get_ref(component):
-        letter = component.REF
-        while True:
-            ret = current[letter]
-            current[letter] += 1
-            ref = letter + str(ret)
-            if ref not in taken:
-                taken.append(ref)
-                return ref
-
-    def get_net_name(net):
-        str_names = set(n for n in net if isinstance(n, str))
-        net_names = set(n.name for n in net if isinstance(n, Net))
+
+def read_netlist(netlist):
+    """Parse a KiCad netlist into nested dicts and lists.
+
+    ``netlist`` can be the netlist text (``str``) or bytes, a path (an
+    ``os.PathLike`` such as ``pathlib.Path``), or a file object or ``mmap``
+    to stream it from. The file is parsed in a single pass and memory use
+    is proportional to the returned tree.
+    """
+    with _open_netlist(netlist) as stream:
+        tokens = chain.from_iterable(_iter_tokens(stream))
+        tree = {}
+        for token in tokens:
+            if token != '(':
+                raise ValueError('Unbalanced brackets in netlist')
+            name, value = _read_node(tokens)
+            tree[name] = value
+    return tree
+
+
+def read_components_map(netlist):
+    """Return the ``{hierarchy: ref}`` map of an existing KiCad netlist.
+
+    ``netlist`` is given like to ``read_netlist``: text, bytes, an
+    ``os.PathLike`` path or a file object. Only the ``(components ...)``
+    section is parsed and reading stops right after it, so the nets are
+    never loaded. The result can be passed as ``components_map`` to
+    ``generate_netlist``.
+    """
+    with _open_netlist(netlist) as stream:
+        tokens = chain.from_iterable(_iter_tokens(stream))
+        for token in tokens:
+            if token != '(':
+                continue
+            name = next(tokens, None)
+            if name == 'components':
+                name, components = _read_node(tokens, name)
+                return {
+                    component['hierarchy']: component['ref']
+                    for component in components
+                    if 'hierarchy' in component and 'ref' in component
+                }
+            if name == '(':
+                raise ValueError('Netlist node without a name')
+    return {}
+
+
+_BUFFER_LINES = 4096
+_HEADER_LINES = (
+    '',
+    '(export (version "E")',
+    '  (design',
+    '    (source "thefile")',
+    '    (date "date")',
+    '    (tool "pypcb")',
+    '  )',
+    '  (components',
+)
+
+
+def _get_kicad_refs(netlist, components_map):
+    # Returns the reference of each component and the order components are
+    # listed in: those found in components_map first, then the new ones.
+    refs = RefAllocator()
+    strings = netlist.strings
+    paths = [strings[i] for i in netlist.component_path.tolist()]
+    kicad_refs = [None] * len(paths)
+    order = []
+
+    if components_map is not None:
+        for i, path in enumerate(paths):
+            if path in components_map:
+                kicad_refs[i] = ref = components_map[path]
+                refs.take(ref)
+                order.append(i)
+
+    for i, prefix in enumerate(netlist.component_ref.tolist()):
+        if kicad_refs[i] is None:
+            kicad_refs[i] = refs.allocate(strings[prefix])
+            order.append(i)
+    return kicad_refs, paths, order
+
+
+def _iter_kicad_nets(netlist):
+    names = NameAllocator()
+    strings = netlist.strings
+    pad_names = [strings[i] for i in netlist.pad_name.tolist()]
+    net_ptr = netlist.net_ptr.tolist()
+    net_pads = netlist.net_pads.tolist()
+    label_ptr = netlist.net_label_ptr.tolist()
+    labels = netlist.net_labels.tolist()
+
+    for j in range(netlist.n_nets):
+        nodes = net_pads[net_ptr[j]:net_ptr[j + 1]]
+        str_names = set(strings[i] for i in labels[label_ptr[j]:label_ptr[j + 1]])
+        net_names = set(pad_names[i] for i in nodes)
 
         if len(str_names):
             name = str_names.pop()
@@ -121,64 +207,239 @@ def generate_netlist(board, components_map=None):
             name = net_names.pop()
         else:
             name = 'NET'
+        yield names.allocate(name), nodes
+
+
+def _iter_netlist_lines(netlist, refs, paths, order):
+    strings = netlist.strings
+    values = netlist.component_value.tolist()
+    footprints = netlist.component_footprint.tolist()
+    yield from _HEADER_LINES
+    for i in order:
+        yield f'    (comp (ref "{refs[i]}")'
+        yield f'      (value "{strings[values[i]]}")'
+        yield f'      (footprint "{strings[footprints[i]]}")'
+        yield f'      (hierarchy "{paths[i]}")'
+        yield '    )'
+    yield '  )'
+    yield '  (nets'
+    pad_refs = [refs[i] for i in netlist.pad_component.tolist()]
+    pad_pins = [strings[i] for i in netlist.pad_pin.tolist()]
+    pad_names = [strings[i] for i in netlist.pad_name.tolist()]
+    for code, (name, nodes) in enumerate(_iter_kicad_nets(netlist), 1):
+        yield f'    (net (code "{code}") (name "{name}")'
+        for node in nodes:
+            yield (
+                f'      (node (ref "{pad_refs[node]}") (pin "{pad_pins[node]}")'
+                f' (pinfunction "{pad_names[node]}") (pintype "passive"))'
+            )
+        yield '    )'
+    yield '  )'
+    yield ')'
+
+
+def write_netlist(board, file, components_map=None):
+    """Write the KiCad netlist of ``board`` to the file-like ``file``.
+
+    ``board`` is a ``Circuit`` or its ``pypcb.ir.Netlist``. The netlist is
+    written in chunks as it is generated, so it is never held in memory as
+    a whole.
+    """
+    netlist = board if isinstance(board, Netlist) else board.build(ir=True)
+    refs, paths, order = _get_kicad_refs(netlist, components_map)
+    lines = []
+    for line in _iter_netlist_lines(netlist, refs, paths, order):
+        lines.append(line)
+        if len(lines) == _BUFFER_LINES:
+            lines.append('')
+            file.write('\n'.join(lines))
+            lines.clear()
+    lines.append('')
+    file.write('\n'.join(lines))
 
-        cnt = 0
-        orig_name = name
-        while name in taken_names:
-            name = orig_name + '_' + str(cnt)
-            cnt += 1
 
-        taken_names.append(name)
-        return name
+def generate_netlist(board, components_map=None):
+    netlist = io.StringIO()
+    write_netlist(board, netlist, components_map=components_map)
+    return netlist.getvalue()
+
 
-    def get_net_nodes(net):
-        return tuple(n for n in net if not isinstance(n, str))
+# Blocks of a netlist laid out by write_netlist, for update_netlist
+_HEADER = ''.join(f'{line}\n' for line in _HEADER_LINES).encode('utf-8')
+_COMP_BLOCK = re.compile(
+    rb'    \(comp \(ref "([^"\n]*)"\)\n'
+    rb'      \(value "([^"\n]*)"\)\n'
+    rb'      \(footprint "([^"\n]*)"\)\n'
+    rb'      \(hierarchy "([^"\n]*)"\)\n'
+    rb'    \)\n'
+)
+_NODE = re.compile(
+    rb'      \(node \(ref "([^"\n]*)"\) \(pin "([^"\n]*)"\)'
+    rb' \(pinfunction "([^"\n]*)"\) \(pintype "passive"\)\)\n'
+)
+_NET_BLOCK = re.compile(
+    rb'    \(net \(code "(\d+)"\) \(name "([^"\n]*)"\)\n'
+    rb'((?:' + _NODE.pattern + rb')*)'
+    rb'    \)\n'
+)
 
+
+def _index_netlist(data):
+    # Returns the comp blocks by hierarchy path and the net blocks by their
+    # first node (ref, pinfunction), or by name for nets without nodes, as
+    # regex matches. None if data is not laid out like write_netlist does.
+    if data[:len(_HEADER)] != _HEADER:
+        return None
+    pos = len(_HEADER)
     components = {}
+    match = _COMP_BLOCK.match(data, pos)
+    while match is not None:
+        components[match.group(4)] = match
+        pos = match.end()
+        match = _COMP_BLOCK.match(data, pos)
+    if data[pos:pos + 12] != b'  )\n  (nets\n':
+        return None
+    pos += 12
+    nets = {}
+    match = _NET_BLOCK.match(data, pos)
+    while match is not None:
+        node = _NODE.match(data, match.start(3), match.end(3))
+        nets[node.group(1, 3) if node else match.group(2)] = match
+        pos = match.end()
+        match = _NET_BLOCK.match(data, pos)
+    if data[pos:] != b'  )\n)\n':
+        return None
+    return components, nets
 
-    if components_map is not None:
-        for component, path in board_components.items():
-            if path in components_map:
-                ref = components_map[path]
-                components[component] = (ref, path)
-                taken.append(ref)
-
-    for component, path in board_components.items():
-        if (components_map is None) or (path not in components_map):
-            components[component] = (get_ref(component), path)
-
-    kicad_netlist = []
-    for net in nets:
-        name = get_net_name(net)
-        nodes = get_net_nodes(net)
-        kicad_netlist.append(_Net(name, nodes))
-
-    netlist_template = jinja2.Template(dedent("""
-        (export (version "E")
-          (design
-            (source "thefile")
-            (date "date")
-            (tool "pypcb")
-          )
-          (components
-            {% for component, (ref, hierarchy) in components.items() %}
-            (comp (ref "{{ref}}")
-              (value "{{component.value}}")
-              (footprint "{{component.footprint}}")
-              (hierarchy "{{hierarchy}}")
-            )
-            {% endfor %}
-          )
-          (nets
-            {% for net in nets %}
-            (net (code "{{loop.index}}") (name "{{net.name}}")
-              {% for node in net %}
-              (node (ref "{{components[node._owner][0]}}") (pin "{{node.pin}}") (pinfunction "{{node.name}}") (pintype "passive"))
-              {% endfor %}
-            )
-            {% endfor %}
-          )
+
+class _Patch:
+    # Writes new text and byte ranges of the previous netlist to a binary
+    # file, merging adjacent ranges into a single write
+
+    def __init__(self, data, file):
+        self.data = data
+        self.file = file
+        self.start = self.end = 0
+        self.copied = 0
+
+    def copy(self, start, end):
+        if start != self.end:
+            self.flush()
+            self.start = start
+        self.end = end
+
+    def write(self, text):
+        self.flush()
+        self.file.write(text)
+
+    def flush(self):
+        if self.end > self.start:
+            self.file.write(self.data[self.start:self.end])
+            self.copied += self.end - self.start
+        self.start = self.end = 0
+
+
+def _patch_netlist(netlist, data, index, file):
+    # Writes the netlist, copying the blocks of data that did not change
+    old_components, old_nets = index
+    components_map = {
+        path.decode('utf-8'): match.group(1).decode('utf-8')
+        for path, match in old_components.items()
+    }
+    refs, paths, order = _get_kicad_refs(netlist, components_map)
+    strings = netlist.strings
+    values = netlist.component_value.tolist()
+    footprints = netlist.component_footprint.tolist()
+    patch = _Patch(data, file)
+    reused = rewritten = 0
+
+    patch.copy(0, len(_HEADER))
+    for i in order:
+        fields = (refs[i], strings[values[i]], strings[footprints[i]], paths[i])
+        match = old_components.get(paths[i].encode('utf-8'))
+        if match is not None and match.groups() == tuple(field.encode('utf-8') for field in fields):
+            patch.copy(*match.span())
+            reused += 1
+        else:
+            patch.write((
+                '    (comp (ref "{}")\n      (value "{}")\n      (footprint "{}")\n'
+                '      (hierarchy "{}")\n    )\n'.format(*fields)
+            ).encode('utf-8'))
+            rewritten += 1
+    patch.write(b'  )\n  (nets\n')
+
+    pad_refs = [refs[i].encode('utf-8') for i in netlist.pad_component.tolist()]
+    pad_pins = [strings[i].encode('utf-8') for i in netlist.pad_pin.tolist()]
+    pad_names = [strings[i].encode('utf-8') for i in netlist.pad_name.tolist()]
+    for code, (name, nodes) in enumerate(_iter_kicad_nets(netlist), 1):
+        header = f'    (net (code "{code}") (name "{name}")\n'.encode('utf-8')
+        match = old_nets.get(
+            (pad_refs[nodes[0]], pad_names[nodes[0]]) if nodes else name.encode('utf-8')
         )
+        if match is not None and _NODE.findall(data, *match.span(3)) == [
+            (pad_refs[node], pad_pins[node], pad_names[node]) for node in nodes
+        ]:
+            # Same nodes: only the code and name may have to be rewritten
+            if data[match.start():match.start(3)] == header:
+                patch.copy(*match.span())
+                reused += 1
+            else:
+                patch.write(header)
+                patch.copy(match.start(3), match.end())
+                rewritten += 1
+            continue
+        patch.write(header + b''.join(
+            b'      (node (ref "%s") (pin "%s") (pinfunction "%s") (pintype "passive"))\n'
+            % (pad_refs[node], pad_pins[node], pad_names[node])
+            for node in nodes
+        ) + b'    )\n')
+        rewritten += 1
+    patch.write(b'  )\n)\n')
+    patch.flush()
+    return reused, rewritten
+
+
+def update_netlist(board, path):
+    """Re-export ``board`` over the KiCad netlist at ``path``.
+
+    The previous netlist is memory-mapped and indexed: components by
+    hierarchy path and nets by their first node. Only the ``comp`` and
+    ``net`` blocks whose content changed are generated again, the others
+    are copied through as raw byte ranges. The result is byte-identical to
+    ``generate_netlist`` with the ``read_components_map`` of the previous
+    netlist, which is what is written if the file was not produced by
+    ``write_netlist``.
 
-    """), trim_blocks=True, lstrip_blocks=True)
-    return netlist_template.render(components=components, nets=kicad_netlist)
+    Unlike the readers, which take a ``str`` as netlist text, ``path`` can
+    be a ``str``. The new netlist replaces it atomically. Returns the
+    number of ``comp``/``net`` blocks kept and rewritten.
+    """
+    netlist = board if isinstance(board, Netlist) else board.build(ir=True)
+    path = os.fspath(path)
+    temp_path = f'{path}.tmp'
+    try:
+        with open(path, 'rb') as f, open(temp_path, 'wb') as out:
+            size = os.fstat(f.fileno()).st_size
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if size else b''
+            try:
+                with memoryview(mapped) as data:
+                    index = _index_netlist(data)
+                    if index is not None:
+                        counts = _patch_netlist(netlist, data, index, out)
+            finally:
+                if size:
+                    mapped.close()
+            if index is None:
+                f.seek(0)
+                components_map = read_components_map(f)
+                text = io.TextIOWrapper(out, encoding='utf-8', newline='')
+                write_netlist(netlist, text, components_map)
+                text.flush()
+                text.detach()
+                counts = (0, netlist.n_components + netlist.n_nets)
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    return counts
@@ -0,0 +1,52 @@
+class RefAllocator:
+    """Allocates component references (``R1``, ``R2``, ``C1``...).
+
+    Each prefix has its own next-free counter and taken references are kept
+    in a set, so every allocation is O(1) amortized. References reserved
+    with ``take`` (e.g. from an existing netlist) are skipped.
+    """
+
+    def __init__(self, taken=()):
+        self._taken = set(taken)
+        self._next = {}
+
+    def take(self, ref):
+        self._taken.add(ref)
+
+    def allocate(self, prefix):
+        taken = self._taken
+        index = self._next.get(prefix, 1)
+        ref = prefix + str(index)
+        while ref in taken:
+            index += 1
+            ref = prefix + str(index)
+        self._next[prefix] = index + 1
+        taken.add(ref)
+        return ref
+
+
+class NameAllocator:
+    """Allocates unique net names.
+
+    A name is used as is the first time; later requests for the same name
+    get ``name_0``, ``name_1``... Each name remembers where its suffix
+    search stopped, so the result is the same as retrying from ``_0`` every
+    time (names are never released) without the quadratic cost.
+    """
+
+    def __init__(self):
+        self._taken = set()
+        self._next = {}
+
+    def allocate(self, name):
+        taken = self._taken
+        if name in taken:
+            index = self._next.get(name, 0)
+            candidate = name + '_' + str(index)
+            while candidate in taken:
+                index += 1
+                candidate = name + '_' + str(index)
+            self._next[name] = index + 1
+            name = candidate
+        taken.add(name)
+        return name
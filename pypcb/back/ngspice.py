@@ -1,16 +1,346 @@
 from .. import Component, Net
-from pypcb.lib.generic import TransistorBJT, Resistor, Capacitor
+from ..ir import Netlist
+from .names import NameAllocator, RefAllocator
+from pypcb.lib.generic import Transistor, Resistor, Capacitor
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+import asyncio
+import hashlib
+import os
+import shutil
 import subprocess
+import tempfile
+import weakref
 import numpy as np
 
 
+# Default limit of concurrent async simulations, one per event loop
+_async_limiters = weakref.WeakKeyDictionary()
+
+
+def _parse_raw_header(header):
+    lines = header.decode('utf-8', errors='replace').splitlines()
+    start = max(i for i, line in enumerate(lines) if line.startswith('Title:'))
+    flags = ''
+    n_points = None
+    variables = []
+    in_variables = False
+    for line in lines[start:]:
+        if in_variables:
+            fields = line.split()
+            if len(fields) >= 2 and fields[0].isdigit():
+                variables.append(fields[1])
+                continue
+            in_variables = False
+        key, _, value = line.partition(':')
+        if key == 'Flags':
+            flags = value.split()
+        elif key == 'No. Points':
+            n_points = int(value)
+        elif key == 'Variables':
+            in_variables = True
+
+    names = []
+    for name in variables:
+        # Field names of a structured array must be unique
+        unique, i = name, 1
+        while unique in names:
+            unique, i = f'{name}#{i}', i + 1
+        names.append(unique)
+    fmt = np.complex128 if 'complex' in flags else np.float64
+    return np.dtype([(name, fmt) for name in names]), n_points
+
+
+def read_raw(raw, mmap=False):
+    """Read the first plot of a binary ngspice raw file.
+
+    ``raw`` is the raw data itself (e.g. the stdout of ``ngspice -s``) or
+    the path of a ``.raw`` file. Returns a structured array with one
+    record per point and one field per variable, named as in the raw
+    header (``time``, ``v(1)``...). Complex plots (AC) have complex fields.
+    Data given as bytes is not copied; with ``mmap=True`` a file is
+    memory-mapped instead of read.
+
+    ngspice only fills in the ``No. Points`` of the header when it writes
+    to a file. Piped output (``ngspice -s``) keeps the placeholder ``0``,
+    so the data is then sized from the bytes available.
+    """
+    if isinstance(raw, (str, os.PathLike)):
+        with open(raw, 'rb') as f:
+            header = b''
+            while b'Binary:\n' not in header:
+                chunk = f.read(1 << 16)
+                if not chunk:
+                    break
+                header += chunk
+        offset = header.find(b'Binary:\n')
+        if offset < 0:
+            raise ValueError(f'{raw} is not a binary ngspice raw file')
+        dtype, n_points = _parse_raw_header(header[:offset])
+        offset += len(b'Binary:\n')
+        available = (os.path.getsize(raw) - offset) // dtype.itemsize
+        count = available if n_points is None else min(n_points, available)
+        if mmap:
+            return np.memmap(raw, dtype=dtype, mode='r', offset=offset, shape=(count,))
+        return np.fromfile(raw, dtype=dtype, count=count, offset=offset)
+
+    offset = raw.find(b'Binary:\n')
+    if offset < 0:
+        raise ValueError('Not binary ngspice raw data')
+    dtype, n_points = _parse_raw_header(raw[:offset])
+    offset += len(b'Binary:\n')
+    available = (len(raw) - offset) // dtype.itemsize
+    count = min(n_points, available) if n_points else available
+    return np.frombuffer(raw, dtype=dtype, count=count, offset=offset)
+
+
+class _NetlistNodes(dict):
+    # Node of each net of a Netlist by index and by name; Pads and Nets are
+    # looked up in the netlist on first use
+    def __init__(self, netlist, nodes):
+        super().__init__(nodes)
+        self.netlist = netlist
+
+    def __missing__(self, member):
+        if isinstance(member, (int, str)):
+            raise KeyError(member)
+        node = self[member] = self[self.netlist.net_of(member)]
+        return node
+
+
+class SimulationCache:
+    """On-disk cache of simulation results.
+
+    Results are stored as ``.npy`` files named after the SHA-256 of the
+    complete deck (circuit, ``.save`` and analysis cards), so any change
+    that affects the simulation is a cache miss. Hits refresh the file's
+    modification time and the least recently used files are evicted once
+    the cache grows over ``max_bytes``.
+    """
+
+    def __init__(self, path, max_bytes=1 << 30):
+        self.path = path
+        self.max_bytes = max_bytes
+        os.makedirs(path, exist_ok=True)
+
+    def _file(self, spice):
+        digest = hashlib.sha256(spice.encode('utf-8')).hexdigest()
+        return os.path.join(self.path, digest + '.npy')
+
+    def get(self, spice):
+        path = self._file(spice)
+        try:
+            data = np.load(path)
+            os.utime(path)
+        except (FileNotFoundError, ValueError, EOFError):
+            return None
+        return data
+
+    def put(self, spice, data):
+        fd, tmp = tempfile.mkstemp(suffix='.tmp', dir=self.path)
+        with os.fdopen(fd, 'wb') as f:
+            np.save(f, data)
+        os.replace(tmp, self._file(spice))
+        self.evict()
+
+    def evict(self):
+        entries = []
+        for entry in os.scandir(self.path):
+            if entry.name.endswith('.npy'):
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        total = sum(size for mtime, size, path in entries)
+        for mtime, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+
+class NgSpiceSession:
+    """A long-lived ngspice process driven through its pipe mode.
+
+    The circuit is loaded once and every analysis is run as an interactive
+    command on it, so the simulator start-up and deck parsing are paid only
+    when the circuit changes. One session can be shared by several
+    ``NgSpice`` instances; call ``close()`` (or use it as a context manager)
+    to stop the simulator.
+    """
+
+    _MARKER = '__pypcb_done__'
+
+    def __init__(self, executable='ngspice'):
+        self._process = subprocess.Popen(
+            [executable, '-p'],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            text=True,
+        )
+        self._tmpdir = tempfile.mkdtemp(prefix='pypcb-ngspice-')
+        self._deck = os.path.join(self._tmpdir, 'circuit.cir')
+        self._raw = os.path.join(self._tmpdir, 'result.raw')
+        self._circuit = None
+        self.command('set filetype=binary')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        if self._process.poll() is None:
+            self._process.stdin.write('quit\n')
+            self._process.stdin.close()
+            self._process.wait()
+        shutil.rmtree(self._tmpdir, ignore_errors=True)
+
+    def command(self, *commands):
+        """Run interactive ngspice commands and return their output lines."""
+        if self._process.poll() is not None:
+            raise RuntimeError('ngspice session is closed')
+        stdin = self._process.stdin
+        for command in commands:
+            stdin.write(command + '\n')
+        stdin.write(f'echo {self._MARKER}\n')
+        stdin.flush()
+
+        output = []
+        for line in self._process.stdout:
+            if line.strip() == self._MARKER:
+                return output
+            output.append(line.rstrip('\n'))
+        raise RuntimeError('ngspice session exited:\n' + '\n'.join(output))
+
+    def load(self, circuit):
+        if circuit == self._circuit:
+            return
+        with open(self._deck, 'w') as f:
+            f.write('\n'.join(['pypcb', circuit, '.end', '']))
+        self.command('destroy all', f'source {self._deck}')
+        self._circuit = circuit
+
+    def alter(self, ref, value, previous, circuit):
+        """Change the main value of ``ref`` in the loaded circuit.
+
+        ``previous`` is the deck text the change applies to and ``circuit``
+        the deck with the change applied, which is what the session
+        considers loaded afterwards. If ``previous`` is not the loaded deck
+        (e.g. another ``NgSpice`` ran on a shared session since),
+        ``circuit`` is loaded instead.
+        """
+        if self._circuit != previous:
+            return self.load(circuit)
+        self.command(f'alter {ref} = {value}')
+        self._circuit = circuit
+
+    def simulate(self, circuit, save, analysis):
+        """Run one analysis (given as dot cards) and return the raw data."""
+        self.load(circuit)
+        if os.path.exists(self._raw):
+            os.remove(self._raw)
+        output = self.command(
+            'delete all',
+            save.lstrip('.'),
+            analysis.lstrip('.'),
+            f'write {self._raw}',
+            'destroy all',
+        )
+        if not os.path.exists(self._raw):
+            raise RuntimeError('Error running ngspice:\n' + '\n'.join(output))
+        return read_raw(self._raw)
+
+
 class NgSpice:
-    def __init__(self, circuit, gnd):
+    """SPICE simulation of a circuit.
+
+    By default every analysis runs in a new ``ngspice -s`` process. Pass
+    ``session=True`` (or an ``NgSpiceSession`` to share) to keep a single
+    simulator running instead. A session started with ``session=True``
+    belongs to the instance: it is stopped by ``close()`` (or at the end of
+    a ``with`` block, or when the instance is garbage collected).
+
+    With ``raw_dir`` the results are written to ``.raw`` files in that
+    directory and memory-mapped rather than piped, which keeps large
+    transients out of RAM. ``cache`` (a ``SimulationCache`` or a directory
+    for one) reuses the results of decks that were already simulated.
+
+    The ``a``-prefixed methods are asyncio versions of the analyses. They
+    always run ngspice as a subprocess and at most as many run at once as
+    ``limiter`` (an ``asyncio.Semaphore``, by default one shared per event
+    loop and sized to the number of CPUs) allows.
+
+    With ``hierarchical=True`` the deck keeps the subcircuit hierarchy:
+    every subcircuit becomes a ``.subckt`` definition, shared by all the
+    instances with the same contents, and an ``X`` line. Nets and
+    components inside subcircuits are then referred to by their flattened
+    ngspice names (``X1.5``, ``R.X1.R1``).
+
+    ``circuit`` can also be a ``pypcb.ir.Netlist``, e.g. a snapshot loaded
+    with ``Netlist.load``, so no design code is needed. Nets (``gnd``,
+    traces) are then given by name or index and components (sweeps,
+    ``alter``, variants) by hierarchy path or index. Components are
+    simulated according to their ``REF``: ``Q`` transistors and ``R``,
+    ``C`` and ``V`` two-terminal elements. A circuit with subcircuits from
+    ``pypcb.parallel.elaborate`` is simulated from its ``Netlist`` the same
+    way (its nets can also be given as members) and can not be emitted
+    with ``hierarchical=True``.
+    """
+
+    def __init__(self, circuit, gnd, session=None, raw_dir=None, cache=None, limiter=None,
+                 hierarchical=False):
         self._gnd = gnd
-        self.nets = circuit.get_nets(clean_nets=False)
-        self.components = circuit.get_components()
+        self._root = circuit
+        self.hierarchical = hierarchical
+        self.raw_dir = raw_dir
+        self.limiter = limiter
+        if isinstance(cache, (str, os.PathLike)):
+            cache = SimulationCache(cache)
+        self.cache = cache
+        self._values = {}
+        if isinstance(circuit, Netlist):
+            if hierarchical:
+                raise ValueError('A Netlist has no hierarchy to emit')
+            self._netlist = circuit
+        else:
+            self._netlist = None
+            try:
+                self.nets = circuit.get_nets(clean_nets=False)
+                self.components = circuit.get_components()
+            except RuntimeError:
+                # Subcircuits from pypcb.parallel.elaborate are only in the
+                # netlist IR, which has no hierarchy
+                if hierarchical:
+                    raise
+                self._netlist = circuit.build(ir=True)
+        self._finalizer = None
+        if session is True:
+            session = NgSpiceSession()
+            self._finalizer = weakref.finalize(self, session.close)
+        self.session = session
         self.process()
 
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        """Stop the session started with ``session=True``.
+
+        A session passed in is shared and left running.
+        """
+        if self._finalizer is not None:
+            self._finalizer()
+
     def _get_net_map(self):
         nets_map = {
             n: i + 1
@@ -25,41 +355,261 @@ class NgSpice:
         return nets_map
 
     def _get_comp_map(self):
-        types = set(c.REF for c in self.components.keys())
-        current = {t: 1 for t in types}
+        refs = RefAllocator()
+        return {c: refs.allocate(c.REF) for c in self.components}
+
+    def _get_netlist_maps(self):
+        # Nets are numbered like _get_net_map does for the same circuit and
+        # are found by index and by name (and by member, for netlists built
+        # from a circuit, see _NetlistNodes). Components are found by index
+        # and by path.
+        netlist = self._netlist
+        strings = netlist.strings
+        label_nets = np.repeat(np.arange(netlist.n_nets), np.diff(netlist.net_label_ptr))
+        net_map = {j: j + 1 for j in range(netlist.n_nets)}
+        for j, label in zip(label_nets.tolist(), netlist.net_labels.tolist()):
+            net_map[strings[label]] = j + 1
+        if isinstance(self._gnd, int):
+            gnd = self._gnd
+        elif isinstance(self._gnd, str):
+            gnd = net_map[self._gnd] - 1
+        else:
+            gnd = netlist.net_of(self._gnd)
+        net_map = _NetlistNodes(netlist, {
+            key: 0 if node == gnd + 1 else node for key, node in net_map.items()
+        })
 
-        def get_ref(component):
-            letter = component.REF
-            while True:
-                ret = current[letter]
-                current[letter] += 1
-                ref = letter + str(ret)
-                return ref
+        refs = RefAllocator()
+        comp_map = {}
+        paths = netlist.component_path.tolist()
+        for i, prefix in enumerate(netlist.component_ref.tolist()):
+            comp_map[i] = comp_map[strings[paths[i]]] = refs.allocate(strings[prefix])
+        if netlist.components is not None:
+            comp_map.update(
+                (c, comp_map[i]) for i, c in enumerate(netlist.components) if c is not None
+            )
+        return net_map, comp_map
 
-        return {c: get_ref(c) for c in self.components}
+    def _get_component_index(self, component):
+        if isinstance(component, int):
+            return component
+        if isinstance(component, str):
+            return self._netlist.component_path.tolist().index(
+                self._netlist.strings.index(component)
+            )
+        return self._netlist.component_of(component)
 
     def process(self):
-        self._net_map = net_map = self._get_net_map()
-        self._comp_map = comp_map = self._get_comp_map()
+        if self.hierarchical:
+            self.circuit, self._net_map, self._comp_map = self._get_hierarchy(self._values)
+            return
+        if self._netlist is not None:
+            self._net_map, self._comp_map = self._get_netlist_maps()
+        else:
+            self._net_map = self._get_net_map()
+            self._comp_map = self._get_comp_map()
+        self.circuit = self._get_circuit(self._values)
+
+    @staticmethod
+    def _get_line(c, ref, node, values, models):
+        if isinstance(c, Transistor):
+            val = f'{ref} {node(c.c)} {node(c.b)} {node(c.e)} {c.spice_name}'
+        elif isinstance(c, (Resistor, Capacitor, VoltageSource)):
+            val = f'{ref} {node(c.p1)} {node(c.p2)} {values.get(c, c.value)}'
+
+        if hasattr(c, 'spice_name') and c.spice_name not in models:
+            models[c.spice_name] = ' '.join(c.spice_model.split())
+        return val
+
+    def _get_circuit(self, values):
+        if self.hierarchical:
+            return self._get_hierarchy(values)[0]
+        if self._netlist is not None:
+            return self._get_netlist_circuit(values)
+        net_map = self._net_map
+        comp_map = self._comp_map
+        models = {}
+        circuit = [
+            self._get_line(c, comp_map[c], net_map.__getitem__, values, models)
+            for c in self.components
+        ]
+        return '\n'.join(list(models.values()) + circuit)
 
+    def _get_netlist_circuit(self, values):
+        netlist = self._netlist
+        strings = netlist.strings
+        values = {self._get_component_index(c): value for c, value in values.items()}
+        pad_nets = netlist.pad_nets().tolist()
+        pad_names = netlist.pad_name.tolist()
+        pad_ptr = netlist.component_pad_ptr.tolist()
+        net_map = self._net_map
+        comp_map = self._comp_map
         models = {}
         circuit = []
-        for c in self.components:
-            if isinstance(c, TransistorBJT):
-                val = f'{comp_map[c]} {net_map[c.c]} {net_map[c.b]} {net_map[c.e]} {c.spice_name}'
-            elif isinstance(c, (Resistor, Capacitor, VoltageSource)):
-                val = f'{comp_map[c]} {net_map[c.p1]} {net_map[c.p2]} {c.value}'
-
-            if hasattr(c, 'spice_name') and c.spice_name not in models:
-                models[c.spice_name] = ' '.join(c.spice_model.split())
+        for i, (prefix, value, spice_name, spice_model) in enumerate(zip(
+            netlist.component_ref.tolist(),
+            netlist.component_value.tolist(),
+            netlist.component_spice_name.tolist(),
+            netlist.component_spice_model.tolist(),
+        )):
+            nodes = {
+                strings[pad_names[p]]: net_map[pad_nets[p]]
+                for p in range(pad_ptr[i], pad_ptr[i + 1])
+                if pad_nets[p] >= 0
+            }
+            prefix = strings[prefix]
+            if prefix == 'Q':
+                val = f'{comp_map[i]} {nodes["c"]} {nodes["b"]} {nodes["e"]} {strings[spice_name]}'
+            elif prefix in ('R', 'C', 'V'):
+                val = f'{comp_map[i]} {nodes["p1"]} {nodes["p2"]} {values.get(i, strings[value])}'
+            else:
+                raise ValueError(f'{strings[netlist.component_path[i]]} can not be simulated')
+
+            if strings[spice_name] and strings[spice_name] not in models:
+                models[strings[spice_name]] = strings[spice_model]
             circuit.append(val)
 
-        self.circuit = '\n'.join(list(models.values()) + circuit)
+        return '\n'.join(list(models.values()) + circuit)
+
+    def _get_hierarchy(self, values):
+        # Returns the hierarchical deck with the net and component maps.
+        # Subcircuit ports are its nets that also have members outside of
+        # it; ground is node 0 everywhere and never a port. Inside a
+        # definition the ports are nodes 1..n and the internal nets follow.
+        #
+        # Instances with the same fingerprint whose nets are ports, ground
+        # or internal alike emit the same definition, so it is emitted once
+        # and the names it gave to nets and components are stamped out for
+        # the other instances by position in their _get_members() and
+        # get_components().
+        top = self._root._get_disjoint_set()
+        gnd = top.find(self._gnd)
+        models = {}
+        definitions = {}
+        names = NameAllocator()
+        net_map = {member: '0' for member in top.members(gnd)}
+        comp_map = {}
+        # fingerprint -> (index in _get_members() of one member, or the
+        # name of a net that only has names, size) of each net
+        layouts = {}
+        # (fingerprint, net roles) -> (definition, net names, component names)
+        fragments = {}
+
+        def get_layout(circuit, members):
+            fingerprint = circuit.fingerprint()
+            layout = layouts.get(fingerprint)
+            if layout is None:
+                index = {member: i for i, member in enumerate(members)}
+                layout = layouts[fingerprint] = [
+                    (next((index[m] for m in net if not isinstance(m, str)), net[0]), len(net))
+                    for net in circuit.get_nets(clean_nets=False)
+                ]
+            return fingerprint, layout
+
+        def instantiate(circuit, prefix):
+            # Returns the ports and the definition of a subcircuit instance
+            members = circuit._get_members()
+            components = list(circuit.get_components())
+            fingerprint, layout = get_layout(circuit, members)
+            roles = []
+            ports = []
+            for i, size in layout:
+                member = i if isinstance(i, str) else members[i]
+                if top.find(member) == gnd:
+                    roles.append('g')
+                elif len(top.members(member)) > size:
+                    roles.append('p')
+                    ports.append(member)
+                else:
+                    roles.append('i')
+
+            key = (fingerprint, ''.join(roles))
+            if any(c in values for c in components):
+                return ports, define(circuit, ports, prefix)
+            if key in fragments:
+                name, net_names, comp_names = fragments[key]
+                for i, net_name in net_names:
+                    net_map[members[i]] = prefix + net_name
+                for i, letter, comp_name in comp_names:
+                    comp_map[components[i]] = f'{letter}.{prefix}{comp_name}'
+                return ports, name
+
+            name = define(circuit, ports, prefix)
+            net_names = [
+                (i, net_map[member][len(prefix):]) for i, member in enumerate(members)
+                if net_map.get(member, '').startswith(prefix)
+            ]
+            comp_names = []
+            for i, c in enumerate(components):
+                letter, comp_name = comp_map[c].split('.', 1)
+                comp_names.append((i, letter, comp_name[len(prefix):]))
+            fragments[key] = (name, net_names, comp_names)
+            return ports, name
+
+        def emit(circuit, ports, prefix):
+            nets = circuit._get_disjoint_set()
+            nodes = {nets.find(port): str(i + 1) for i, port in enumerate(ports)}
+            internal = []
+
+            def node(member):
+                if top.find(member) == gnd:
+                    return '0'
+                root = nets.find(member)
+                name = nodes.get(root)
+                if name is None:
+                    name = nodes[root] = str(len(nodes) + 1)
+                    internal.append(root)
+                return name
+
+            refs = RefAllocator()
+            body = []
+            for name, c in circuit.components:
+                ref = refs.allocate(c.REF)
+                comp_map[c] = f'{ref[0]}.{prefix}{ref}' if prefix else ref
+                body.append(self._get_line(c, ref, node, values, models))
+            for name, subcircuit in circuit.subcircuits:
+                ref = refs.allocate('X')
+                sub_ports, body_name = instantiate(subcircuit, f'{prefix}{ref}.')
+                body.append(' '.join([ref] + [node(port) for port in sub_ports] + [body_name]))
+
+            # Set after the subcircuits, whose ports are these same nets
+            for root in internal:
+                for member in nets.members(root):
+                    net_map[member] = prefix + nodes[root]
+            return body
+
+        def define(circuit, ports, prefix):
+            key = (len(ports), '\n'.join(emit(circuit, ports, prefix)))
+            name = definitions.get(key)
+            if name is None:
+                name = definitions[key] = names.allocate(type(circuit).__name__.lower())
+            return name
+
+        body = emit(self._root, [], '')
+        deck = list(models.values())
+        for (n_ports, definition), name in definitions.items():
+            ports = ' '.join(str(i + 1) for i in range(n_ports))
+            deck += [f'.subckt {name} {ports}'.rstrip(), definition, f'.ends {name}']
+        return '\n'.join(deck + body), net_map, comp_map
+
+    def alter(self, component, value):
+        """Change the value of ``component`` for the following analyses.
+
+        With a session the change is applied with ngspice's ``alter``
+        command instead of reloading the circuit.
+        """
+        if self._netlist is not None:
+            component = self._get_component_index(component)
+        previous = self.circuit
+        self._values[component] = value
+        self.process()
+        if self.session is not None:
+            self.session.alter(self._comp_map[component], value, previous, self.circuit)
 
     def get_dot_save(self, trace):
         if isinstance(trace, (tuple, list)):
             for t in trace:
-                if not isinstance(t, Net):
+                if not isinstance(t, (Net, str, int)):
                     raise NotImplementedError('Currently only net trace is supported')
             trace = ' '.join(str(self._net_map[t]) for t in trace)
         else:
@@ -67,29 +617,125 @@ class NgSpice:
         return f'.save {trace}'
 
     def run(self, spice):
-        process = subprocess.Popen(
-            ['ngspice', '-s'],
-            stdin=subprocess.PIPE,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE
-        )
-        stdout, stderr = process.communicate(spice.encode('utf-8'))
-        if process.returncode:
+        """Simulate a complete deck and return its results (see ``read_raw``)."""
+        if self.raw_dir is None:
+            process = subprocess.Popen(
+                ['ngspice', '-s'],
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE
+            )
+            stdout, stderr = process.communicate(spice.encode('utf-8'))
+            return self._get_results(spice, process.returncode, stdout)
+
+        with self._raw_file(spice) as (args, raw):
+            process = subprocess.run(args, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+            return self._get_results(spice, process.returncode, raw)
+
+    async def arun(self, spice):
+        """Async version of ``run``."""
+        async with self._get_limiter():
+            if self.raw_dir is None:
+                process = await asyncio.create_subprocess_exec(
+                    'ngspice', '-s',
+                    stdin=subprocess.PIPE,
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.PIPE
+                )
+                stdout, stderr = await process.communicate(spice.encode('utf-8'))
+                return self._get_results(spice, process.returncode, stdout)
+
+            with self._raw_file(spice) as (args, raw):
+                process = await asyncio.create_subprocess_exec(
+                    *args, stdout=subprocess.PIPE, stderr=subprocess.STDOUT
+                )
+                await process.communicate()
+                return self._get_results(spice, process.returncode, raw)
+
+    def _get_limiter(self):
+        if self.limiter is not None:
+            return self.limiter
+        loop = asyncio.get_running_loop()
+        limiter = _async_limiters.get(loop)
+        if limiter is None:
+            limiter = _async_limiters[loop] = asyncio.Semaphore(os.cpu_count())
+        return limiter
+
+    @contextmanager
+    def _raw_file(self, spice):
+        # Yields the ngspice command line that simulates spice into a .raw
+        # file in raw_dir, and the path of that file.
+        fd, raw = tempfile.mkstemp(suffix='.raw', dir=self.raw_dir)
+        os.close(fd)
+        deck = raw[:-len('.raw')] + '.cir'
+        try:
+            with open(deck, 'w') as f:
+                f.write(spice + '\n')
+            yield ['ngspice', '-b', '-r', raw, deck], raw
+        finally:
+            os.remove(deck)
+            try:
+                # A mapping of the results stays valid after the file is
+                # unlinked (POSIX)
+                os.remove(raw)
+            except OSError:
+                pass
+
+    @staticmethod
+    def _get_results(spice, returncode, raw):
+        if returncode:
             print(spice.encode('utf-8'))
             raise RuntimeError('Error running ngpsice')
-        data = stdout.split(b'Binary:\n')[1]
-        data = np.frombuffer(data, dtype=np.float64)
+        return read_raw(raw, mmap=True)
+
+    @staticmethod
+    def _get_spice(circuit, save, analysis):
+        return '\n'.join([
+            'test -s',
+            circuit,
+            save,
+            analysis,
+            ".end",
+        ])
+
+    def _run_cached(self, spice, run):
+        if self.cache is None:
+            return run()
+        data = self.cache.get(spice)
+        if data is None:
+            data = run()
+            self.cache.put(spice, data)
+        return data
+
+    def simulate(self, save, analysis):
+        """Run one analysis given as ``.save`` and analysis dot cards."""
+        spice = self._get_spice(self.circuit, save, analysis)
+        if self.session is not None:
+            return self._run_cached(
+                spice, lambda: self.session.simulate(self.circuit, save, analysis)
+            )
+        return self._run_cached(spice, lambda: self.run(spice))
+
+    async def _arun_cached(self, spice):
+        if self.cache is None:
+            return await self.arun(spice)
+        data = self.cache.get(spice)
+        if data is None:
+            data = await self.arun(spice)
+            self.cache.put(spice, data)
         return data
 
+    async def asimulate(self, save, analysis):
+        """Async version of ``simulate``; does not use the session."""
+        return await self._arun_cached(self._get_spice(self.circuit, save, analysis))
+
     @staticmethod
     def get_variables(data, variables):
-        n_variables = len(variables)
-        rv = {}
-        for i, v in enumerate(variables):
-            rv[v] = data[i::n_variables]
-        return rv
+        # Columns of the raw data are in .save order, after the scale
+        names = data.dtype.names
+        return {v: data[names[i]] for i, v in enumerate(variables)}
 
-    def dcsweep(self, sweep, trace=None):
+    def _dcsweep_cards(self, sweep, trace):
         dc_cmd = ['.dc']
         for v, (start, stop, inc) in sweep:
             dc_cmd.append(
@@ -100,41 +746,113 @@ class NgSpice:
                     inc,
                 )
             )
-        spice = '\n'.join([
-            'test -s',
-            self.circuit,
-            self.get_dot_save(trace),
-            ' '.join(dc_cmd),
-            ".end",
-        ])
+        variables = [s[0] for s in sweep] + list(trace)
+        return self.get_dot_save(trace), ' '.join(dc_cmd), variables
 
-        data = self.run(spice)
-        return self.get_variables(data, [s[0] for s in sweep] + list(trace))
-
-    def transient(self, step, stop, units='ns', trace=None):
+    def _transient_cards(self, step, stop, units='ns', trace=None):
         assert units in ['ns', 'us', 'ms', 's']
 
         tran_cmd = f'.tran {step}{units} {stop}{units}'
-        spice = '\n'.join([
-            'test -s',
-            self.circuit,
-            self.get_dot_save(trace),
-            tran_cmd,
-            ".end",
-        ])
-
-        data = self.run(spice)
         variables = ['time'] + list(trace)
-        return self.get_variables(data, variables)
+        return self.get_dot_save(trace), tran_cmd, variables
+
+    def _ac_cards(self, points, start, stop, variation='dec', trace=None):
+        assert variation in ['dec', 'oct', 'lin']
+
+        ac_cmd = f'.ac {variation} {points} {start} {stop}'
+        variables = ['frequency'] + list(trace)
+        return self.get_dot_save(trace), ac_cmd, variables
+
+    def dcsweep(self, sweep, trace=None):
+        save, analysis, variables = self._dcsweep_cards(sweep, trace)
+        return self.get_variables(self.simulate(save, analysis), variables)
+
+    def transient(self, step, stop, units='ns', trace=None):
+        save, analysis, variables = self._transient_cards(step, stop, units, trace)
+        return self.get_variables(self.simulate(save, analysis), variables)
+
+    def ac(self, points, start, stop, variation='dec', trace=None):
+        """Small-signal AC analysis; traced values are complex."""
+        save, analysis, variables = self._ac_cards(points, start, stop, variation, trace)
+        return self.get_variables(self.simulate(save, analysis), variables)
+
+    async def adcsweep(self, sweep, trace=None):
+        save, analysis, variables = self._dcsweep_cards(sweep, trace)
+        return self.get_variables(await self.asimulate(save, analysis), variables)
+
+    async def atransient(self, step, stop, units='ns', trace=None):
+        save, analysis, variables = self._transient_cards(step, stop, units, trace)
+        return self.get_variables(await self.asimulate(save, analysis), variables)
+
+    async def aac(self, points, start, stop, variation='dec', trace=None):
+        save, analysis, variables = self._ac_cards(points, start, stop, variation, trace)
+        return self.get_variables(await self.asimulate(save, analysis), variables)
+
+    def _get_variant_decks(self, variants, analysis, args, kwargs):
+        cards = {
+            'dcsweep': self._dcsweep_cards,
+            'transient': self._transient_cards,
+            'ac': self._ac_cards,
+        }[analysis]
+        save, cards, variables = cards(*args, **kwargs)
+        if analysis == 'transient':
+            # The accepted timesteps depend on the component values, so the
+            # results are interpolated on the step grid to have the same
+            # points for every variant
+            cards = '.options interp\n' + cards
+        decks = [
+            self._get_spice(self._get_circuit({**self._values, **variant}), save, cards)
+            for variant in variants
+        ]
+        return decks, variables
+
+    def batch(self, variants, analysis, *args, workers=None, **kwargs):
+        """Run ``analysis`` once per variant and stack the results.
+
+        ``variants`` is a sequence of ``{component: value}`` overrides (for
+        sweeps or Monte Carlo tolerance runs) applied on top of the current
+        values. ``analysis`` is ``'dcsweep'``, ``'transient'`` or ``'ac'``
+        and the remaining arguments are passed to it. Every variant runs in
+        its own ngspice process, at most ``workers`` (default: the number of
+        CPUs) at a time. Returns ``{variable: array}`` where each array has
+        one row per variant. Transients are run with ``.options interp``:
+        every variant is output at multiples of ``step`` rather than at the
+        timesteps the simulator picked for it.
+        """
+        decks, variables = self._get_variant_decks(variants, analysis, args, kwargs)
+        with ThreadPoolExecutor(max_workers=workers or os.cpu_count()) as executor:
+            results = list(executor.map(
+                lambda spice: self._run_cached(spice, lambda: self.run(spice)),
+                decks,
+            ))
+
+        if not results:
+            return {v: np.empty((0, 0)) for v in variables}
+        results = [self.get_variables(data, variables) for data in results]
+        return {v: np.stack([result[v] for result in results]) for v in variables}
+
+    async def abatch(self, variants, analysis, *args, **kwargs):
+        """Async version of ``batch`` that streams results as they finish.
+
+        Yields ``(index, {variable: array})`` for each variant, in completion
+        order. Concurrency is bounded by the limiter.
+        """
+        decks, variables = self._get_variant_decks(variants, analysis, args, kwargs)
+
+        async def run(index, spice):
+            return index, await self._arun_cached(spice)
+
+        for future in asyncio.as_completed([run(i, spice) for i, spice in enumerate(decks)]):
+            index, data = await future
+            yield index, self.get_variables(data, variables)
 
 
 class VoltageSource(Component):
     REF = 'V'
+    PINOUT = (('1', 'p1'), ('2', 'p2'))
 
     def __init__(self, value, *, name=None, src_loc_at=0):
         super().__init__(name=name, src_loc_at=src_loc_at + 1)
         self.value = value
-        self.add_pad('1', 'p1')
-        self.add_pad('2', 'p2')
         self.p = self.p1
         self.n = self.p2
@@ -0,0 +1,229 @@
+"""Benchmarks of elaboration and of the KiCad backend.
+
+Builds synthetic boards of common emitter stages, like
+``examples/amplifier.py``, nested ``depth`` levels deep and times each
+phase: construction (including the tracer), net resolution, component
+mapping, export and re-import. Results are printed as JSON so runs on
+different commits can be compared::
+
+    python -m pypcb.bench
+    pypcb-bench --stages 100 1000 --depth 1 3 --repeat 3 > results.json
+"""
+from . import Net, Circuit, Board
+from .back.kicad import generate_netlist, read_netlist, read_components_map
+from .lib.generic import Transistor, Resistor, Capacitor, Connector
+import argparse
+import gc
+import io
+import json
+import platform
+import sys
+import time
+import tracemalloc
+
+
+__all__ = ['PHASES', 'make_board', 'run']
+
+
+PHASES = ('construction', 'net_resolution', 'component_mapping', 'export', 'reimport')
+
+# Subcircuits per level of hierarchy above the stages
+_FANOUT = 4
+
+
+class BC548(Transistor):
+    footprint = 'Package_TO_SOT_THT:TO-92_Inline'
+    value = 'BC548'
+
+
+class Resistor0805(Resistor):
+    footprint = 'Resistor_SMD:R_0805_2012Metric'
+
+
+class Capacitor0805(Capacitor):
+    footprint = 'Capacitor_SMD:C_0805_2012Metric'
+
+
+class Stage(Circuit):
+    def __init__(self):
+        super().__init__()
+        self.vcc = Net()
+        self.gnd = Net()
+        self.input = Net()
+        self.output = Net()
+
+        q1 = BC548()
+        r1 = Resistor0805(1e3)
+        r2 = Resistor0805(1e3)
+        rc = Resistor0805(1e3)
+
+        self.connections += [
+            (r1.p1, rc.p1, self.vcc),
+            (self.input, r1.p2, r2.p1, q1.b),
+            (r2.p2, q1.e, self.gnd),
+            (q1.c, rc.p2, self.output),
+        ]
+
+
+class Chain(Circuit):
+    """``n_stages`` stages coupled by capacitors.
+
+    Above ``depth`` 1 the stages are split among up to ``_FANOUT`` chains
+    one level less deep.
+    """
+
+    def __init__(self, n_stages, depth):
+        super().__init__()
+        self.vcc = Net()
+        self.gnd = Net()
+        self.input = Net()
+        self.output = Net()
+
+        if depth <= 1:
+            blocks = [Stage() for i in range(n_stages)]
+        else:
+            n_blocks = min(_FANOUT, n_stages)
+            blocks = [
+                Chain(n_stages * (i + 1) // n_blocks - n_stages * i // n_blocks, depth - 1)
+                for i in range(n_blocks)
+            ]
+        capacitors = [Capacitor0805(1e-6, name=f'c{i}') for i in range(len(blocks) - 1)]
+
+        for i, block in enumerate(blocks):
+            self.subcircuits[f'block{i}'] = block
+            self.connections += [(self.vcc, block.vcc), (self.gnd, block.gnd)]
+        for left, capacitor, right in zip(blocks, capacitors, blocks[1:]):
+            self.connections += [(left.output, capacitor.p1), (capacitor.p2, right.input)]
+        self.connections += [
+            (self.input, blocks[0].input),
+            (self.output, blocks[-1].output),
+        ]
+
+
+class BenchBoard(Board):
+    def __init__(self, n_stages, depth):
+        super().__init__()
+        power_conn = Connector(2)
+        input_conn = Connector(2)
+        output_conn = Connector(2)
+        chain = Chain(n_stages, depth)
+        self.subcircuits['chain'] = chain
+
+        vcc = power_conn.p1
+        gnd = power_conn.p2
+        self.connections += [
+            (vcc, chain.vcc, 'VCC'),
+            (gnd, chain.gnd, input_conn.p2, output_conn.p2, 'GND'),
+            (input_conn.p1, chain.input, 'INPUT'),
+            (output_conn.p1, chain.output, 'OUTPUT'),
+        ]
+
+
+def make_board(n_stages, depth=1):
+    """Return a board of ``n_stages`` common emitter stages (at least one)
+    in a hierarchy ``depth`` levels deep."""
+    return BenchBoard(max(n_stages, 1), depth)
+
+
+def _run_phases(n_stages, depth, memory):
+    # Returns the time or the peak memory of each phase and the board
+    results = {}
+    state = {}
+
+    def construction():
+        state['board'] = make_board(n_stages, depth)
+
+    def net_resolution():
+        state['nets'] = state['board'].get_nets()
+
+    def component_mapping():
+        state['components'] = state['board'].get_components()
+
+    def export():
+        state['netlist'] = generate_netlist(state['board'])
+
+    def reimport():
+        read_netlist(state['netlist'])
+        read_components_map(io.StringIO(state['netlist']))
+
+    for name, phase in zip(PHASES, (
+        construction, net_resolution, component_mapping, export, reimport
+    )):
+        gc.collect()
+        if memory:
+            tracemalloc.start()
+            phase()
+            results[name] = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+        else:
+            start = time.perf_counter()
+            phase()
+            results[name] = time.perf_counter() - start
+    return results, state
+
+
+def run(n_stages, depth=1, repeat=1, memory=True):
+    """Benchmark one board and return the results as a dict.
+
+    Each phase is timed ``repeat`` times on a new board and the best time
+    is kept, in seconds. With ``memory`` the phases are then run once more
+    under ``tracemalloc`` for their peak memory, in bytes, so the tracing
+    overhead does not show in the times.
+    """
+    if repeat < 1:
+        raise ValueError(f'repeat must be at least 1, not {repeat}')
+    times = None
+    for i in range(repeat):
+        elapsed, state = _run_phases(n_stages, depth, memory=False)
+        times = elapsed if times is None else {
+            name: min(times[name], elapsed[name]) for name in PHASES
+        }
+    peaks = _run_phases(n_stages, depth, memory=True)[0] if memory else {}
+
+    return {
+        'stages': n_stages,
+        'depth': depth,
+        'components': len(state['components']),
+        'nets': len(state['nets']),
+        'netlist_bytes': len(state['netlist'].encode('utf-8')),
+        'phases': {
+            name: {'time': times[name], 'peak_memory': peaks.get(name)}
+            for name in PHASES
+        },
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='pypcb-bench', description='Benchmark elaboration and the KiCad backend.'
+    )
+    parser.add_argument('--stages', type=int, nargs='+', default=[10, 100, 1000],
+                        help='Number of common emitter stages of each board')
+    parser.add_argument('--depth', type=int, nargs='+', default=[1, 3],
+                        help='Levels of hierarchy of each board')
+    parser.add_argument('--repeat', type=int, default=1,
+                        help='Runs per board, the best time is reported')
+    parser.add_argument('--no-memory', dest='memory', action='store_false',
+                        help='Do not measure peak memory')
+    parser.add_argument('-o', '--output', type=str, help='Output JSON file (default stdout)')
+    args = parser.parse_args(argv)
+
+    report = {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'results': [
+            run(n_stages, depth, repeat=args.repeat, memory=args.memory)
+            for n_stages in args.stages
+            for depth in args.depth
+        ],
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        sys.stdout.write('\n')
+
+
+if __name__ == '__main__':
+    main()
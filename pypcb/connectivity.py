@@ -0,0 +1,85 @@
+import numpy as np
+
+
+__all__ = ['Connectivity']
+
+
+class Connectivity:
+    """Indexed connectivity of a circuit.
+
+    A view of the circuit's ``pypcb.ir.Netlist``: nets are numbered like
+    there, members are found with ``Netlist.net_of`` and the pads of a net
+    are read from its CSR arrays, so queries cost O(result) whatever the
+    size of the board. Built with ``Circuit.build(index=True)``; it does
+    not follow later changes to the circuit, and looking up members raises
+    ``RuntimeError`` once the circuit changed.
+    """
+
+    def __init__(self, circuit):
+        self.netlist = netlist = circuit.build(ir=True)
+        if None in netlist.components:
+            raise ValueError(f'{circuit} has subcircuits without Component objects')
+        self.components = circuit.get_components()
+        strings = netlist.strings
+        self._pad_component = netlist.pad_component.tolist()
+        self._pad_name = [strings[i] for i in netlist.pad_name.tolist()]
+        self._net_ptr = netlist.net_ptr.tolist()
+        self._net_pads = netlist.net_pads.tolist()
+        self._pad_ptr = netlist.component_pad_ptr.tolist()
+        self._pad_net = netlist.pad_nets()
+        self._unconnected = None
+
+    def _pad(self, i):
+        # The Pad object of pad number ``i``
+        return self.netlist.components[self._pad_component[i]]._pads[self._pad_name[i]]
+
+    def __len__(self):
+        return self.netlist.n_nets
+
+    def net(self, member):
+        """Return the net of a ``Pad``, ``Net`` or net name.
+
+        Raises ``KeyError`` if it is not connected.
+        """
+        return self.netlist.net_of(member)
+
+    def net_named(self, name):
+        """Return the net given the name ``name`` in the connections."""
+        return self.netlist._get_names()[name]
+
+    def names(self):
+        return dict(self.netlist._get_names())
+
+    def pads(self, net):
+        """Return the pads on net number ``net``."""
+        return tuple(map(self._pad, self._net_pads[self._net_ptr[net]:self._net_ptr[net + 1]]))
+
+    def neighbours(self, pad):
+        """Return the other pads on the net of ``pad``."""
+        return tuple(p for p in self.pads(self.net(pad)) if p is not pad)
+
+    def net_components(self, net):
+        """Return the components with a pad on net number ``net``."""
+        components = self.netlist.components
+        return tuple(dict.fromkeys(
+            components[self._pad_component[p]]
+            for p in self._net_pads[self._net_ptr[net]:self._net_ptr[net + 1]]
+        ))
+
+    def component_nets(self, component):
+        """Return the nets the pads of ``component`` are connected to."""
+        try:
+            i = self.netlist.component_of(component)
+        except KeyError:
+            return ()
+        nets = self._pad_net[self._pad_ptr[i]:self._pad_ptr[i + 1]]
+        return tuple(np.unique(nets[nets >= 0]).tolist())
+
+    def unconnected_pads(self):
+        """Return the pads of the circuit's components that are on no net.
+
+        Computed on the first call.
+        """
+        if self._unconnected is None:
+            self._unconnected = tuple(map(self._pad, np.flatnonzero(self._pad_net < 0).tolist()))
+        return self._unconnected
@@ -0,0 +1,154 @@
+from .ir import Netlist
+from .back.kicad import _get_kicad_refs, _iter_kicad_nets
+from collections import Counter, namedtuple
+import re
+
+
+__all__ = ['ComponentChange', 'PadMove', 'Diff', 'diff']
+
+
+# Suffix added by NameAllocator to repeated net names
+_NAME_SUFFIX = re.compile(r'_\d+$')
+
+ComponentChange = namedtuple('ComponentChange', ('path', 'field', 'old', 'new'))
+PadMove = namedtuple('PadMove', ('path', 'pad', 'old_net', 'new_net'))
+
+
+class Diff(namedtuple('Diff', ('added', 'removed', 'changed', 'moved', 'renamed'))):
+    """Changes between two netlists.
+
+    ``added``/``removed`` are hierarchy paths of components, ``changed`` the
+    ``ComponentChange`` of their ref, value or footprint, ``moved`` the
+    ``PadMove`` of pads that changed net (``None`` for unconnected) and
+    ``renamed`` the ``(old, new)`` names of nets that were kept. Names that
+    only differ by the ``_N`` suffix given to repeated names are not
+    renames.
+    """
+
+    def __bool__(self):
+        return any(len(changes) for changes in self)
+
+
+class _Side:
+    # A netlist as {path: (ref, value, footprint)}, net names and
+    # {(path, pad name): net}.
+
+    def __init__(self, design, components_map=None):
+        if isinstance(design, dict):
+            self._from_kicad(design)
+        else:
+            if not isinstance(design, Netlist):
+                design = design.build(ir=True)
+            self._from_netlist(design, components_map)
+
+    def _from_netlist(self, netlist, components_map):
+        strings = netlist.strings
+        refs, paths, order = _get_kicad_refs(netlist, components_map)
+        values = netlist.component_value.tolist()
+        footprints = netlist.component_footprint.tolist()
+        self.components = {
+            paths[i]: (refs[i], strings[values[i]], strings[footprints[i]])
+            for i in range(len(paths))
+        }
+        pad_component = netlist.pad_component.tolist()
+        pad_name = [strings[i] for i in netlist.pad_name.tolist()]
+        self.nets = []
+        self.pads = {}
+        for j, (name, nodes) in enumerate(_iter_kicad_nets(netlist)):
+            self.nets.append(name)
+            for pad in nodes:
+                self.pads[paths[pad_component[pad]], pad_name[pad]] = j
+
+    def _from_kicad(self, tree):
+        export = tree.get('export', tree)
+        paths = {}
+        self.components = {}
+        for component in export.get('components', []):
+            path = component.get('hierarchy', component.get('ref'))
+            paths[component.get('ref')] = path
+            self.components[path] = (
+                component.get('ref'), component.get('value', ''), component.get('footprint', '')
+            )
+        self.nets = []
+        self.pads = {}
+        for j, net in enumerate(export.get('nets', [])):
+            self.nets.append(net.get('name', ''))
+            for node in net.get('nodes', []):
+                path = paths.get(node.get('ref'), node.get('ref'))
+                self.pads[path, node.get('pinfunction', node.get('pin'))] = j
+
+    def components_map(self):
+        return {path: ref for path, (ref, value, footprint) in self.components.items()}
+
+
+def _best_matches(pairs):
+    # For each key the value it shares the most pads with (first on ties)
+    best = {}
+    for (key, value), count in pairs.items():
+        if key not in best or count > best[key][1]:
+            best[key] = (value, count)
+    return {key: value for key, (value, count) in best.items()}
+
+
+def diff(old, new, components_map=None):
+    """Compare two netlists and return their ``Diff``.
+
+    ``old`` and ``new`` are each a ``Circuit``, its ``pypcb.ir.Netlist``
+    (``Board.build(ir=True)``, possibly a loaded snapshot) or a KiCad
+    netlist parsed with ``read_netlist``. Components are matched by
+    hierarchy path and pads by component path and pad name, with dicts, so
+    the comparison is linear in the size of the netlists.
+
+    Refs of a circuit or IR are allocated like ``generate_netlist`` would
+    with ``components_map``. By default ``new`` keeps the refs of ``old``,
+    as exporting it over the old netlist would, so only refs fixed by hand
+    in a KiCad netlist show up as changed.
+
+    Nets have no identity across builds, so they are matched by their pads:
+    a net of ``old`` and one of ``new`` are the same net if each is the
+    one the other shares the most pads with. Pads of a kept net that end up
+    on another net are reported as moved.
+    """
+    old = _Side(old, components_map)
+    new = _Side(new, old.components_map() if components_map is None else components_map)
+
+    added = tuple(path for path in new.components if path not in old.components)
+    removed = tuple(path for path in old.components if path not in new.components)
+    changed = []
+    for path, old_fields in old.components.items():
+        new_fields = new.components.get(path)
+        if new_fields is None:
+            continue
+        for field, old_value, new_value in zip(('ref', 'value', 'footprint'), old_fields, new_fields):
+            if old_value != new_value:
+                changed.append(ComponentChange(path, field, old_value, new_value))
+
+    pairs = Counter(
+        (net, new.pads[pad]) for pad, net in old.pads.items() if pad in new.pads
+    )
+    old_match = _best_matches(pairs)
+    new_match = _best_matches(Counter({(b, a): count for (a, b), count in pairs.items()}))
+
+    def kept(old_net, new_net):
+        return old_match.get(old_net) == new_net and new_match.get(new_net) == old_net
+
+    moved = []
+    for (path, pad), old_net in old.pads.items():
+        if path not in new.components:
+            continue
+        new_net = new.pads.get((path, pad))
+        if new_net is None or not kept(old_net, new_net):
+            moved.append(PadMove(
+                path, pad, old.nets[old_net], None if new_net is None else new.nets[new_net]
+            ))
+    for (path, pad), new_net in new.pads.items():
+        if path in old.components and (path, pad) not in old.pads:
+            moved.append(PadMove(path, pad, None, new.nets[new_net]))
+
+    renamed = []
+    for a, b in old_match.items():
+        if new_match.get(b) != a:
+            continue
+        if _NAME_SUFFIX.sub('', old.nets[a]) != _NAME_SUFFIX.sub('', new.nets[b]):
+            renamed.append((old.nets[a], new.nets[b]))
+    return Diff(added, removed, tuple(changed), tuple(moved), tuple(renamed))
@@ -0,0 +1,139 @@
+from .ir import Netlist
+from collections import namedtuple
+import numpy as np
+
+
+__all__ = ['Violation', 'RULES', 'check']
+
+
+Violation = namedtuple('Violation', ('rule', 'message', 'net', 'components', 'src_locs'))
+Violation.__doc__ = """An ERC violation.
+
+``net`` is the net number (``None`` for unconnected pads), ``components``
+the hierarchy paths of the components involved and ``src_locs`` their
+``(file, line)`` source locations (``None`` when not captured).
+"""
+
+RULES = ('single-pad-net', 'unconnected-pad', 'shorted-names', 'floating-power')
+
+
+class _Checker:
+    # The rules select the offending nets and pads with array operations;
+    # the violations are then described from plain lists, which are much
+    # faster than NumPy for element by element access.
+
+    def __init__(self, netlist):
+        self.netlist = netlist
+        self.strings = netlist.strings
+        self.n_pads = np.diff(netlist.net_ptr)
+        self.n_labels = np.diff(netlist.net_label_ptr)
+        self.pad_nets = netlist.pad_nets()
+        self._lists = {}
+
+    def as_list(self, name):
+        array = self._lists.get(name)
+        if array is None:
+            array = self._lists[name] = getattr(self.netlist, name).tolist()
+        return array
+
+    def net_labels(self, net):
+        label_ptr = self.as_list('net_label_ptr')
+        return self.as_list('net_labels')[label_ptr[net]:label_ptr[net + 1]]
+
+    def net_pads(self, net):
+        net_ptr = self.as_list('net_ptr')
+        return self.as_list('net_pads')[net_ptr[net]:net_ptr[net + 1]]
+
+    def net_name(self, net):
+        labels = self.net_labels(net)
+        if labels:
+            return self.strings[labels[0]]
+        return f'#{net}'
+
+    def pad_name(self, pad):
+        strings = self.strings
+        path = strings[self.as_list('component_path')[self.as_list('pad_component')[pad]]]
+        return f'{path}.{strings[self.as_list("pad_name")[pad]]}'
+
+    def violation(self, rule, message, net, pads):
+        strings = self.strings
+        pad_component = self.as_list('pad_component')
+        src_files = self.as_list('component_src_file')
+        src_lines = self.as_list('component_src_line')
+        paths = self.as_list('component_path')
+        components = list(dict.fromkeys(pad_component[pad] for pad in pads))
+        src_locs = tuple(
+            (strings[src_files[c]], src_lines[c]) if strings[src_files[c]] else None
+            for c in components
+        )
+        return Violation(rule, message, net, tuple(strings[paths[c]] for c in components), src_locs)
+
+    def single_pad_net(self):
+        for net in np.flatnonzero(self.n_pads == 1).tolist():
+            pads = self.net_pads(net)
+            yield self.violation(
+                'single-pad-net',
+                f'Net {self.net_name(net)} only connects {self.pad_name(pads[0])}',
+                net, pads,
+            )
+
+    def unconnected_pad(self):
+        pad_pin = self.as_list('pad_pin')
+        for pad in np.flatnonzero(self.pad_nets < 0).tolist():
+            yield self.violation(
+                'unconnected-pad',
+                f'Pad {self.pad_name(pad)} (pin {self.strings[pad_pin[pad]]}) is not connected',
+                None, [pad],
+            )
+
+    def shorted_names(self):
+        for net in np.flatnonzero(self.n_labels > 1).tolist():
+            yield self.violation(
+                'shorted-names',
+                'Net names {} are shorted together'.format(
+                    ', '.join(self.strings[label] for label in self.net_labels(net))
+                ),
+                net, self.net_pads(net),
+            )
+
+    def floating_power(self):
+        # Power pads on no net, or alone on their net
+        nets = self.pad_nets
+        connected = nets >= 0
+        alone = np.zeros(len(nets), dtype=np.bool_)
+        alone[connected] = self.n_pads[nets[connected]] == 1
+        floating = self.netlist.pad_power & (~connected | alone)
+        for pad in np.flatnonzero(floating).tolist():
+            net = int(nets[pad])
+            yield self.violation(
+                'floating-power',
+                f'Power pad {self.pad_name(pad)} is floating',
+                net if net >= 0 else None, [pad],
+            )
+
+
+def check(design, rules=RULES):
+    """Run an electrical rule check and return the list of violations.
+
+    ``design`` is a ``Circuit`` or a ``pypcb.ir.Netlist`` (e.g. a loaded
+    snapshot). The rules are evaluated over the netlist arrays at once;
+    only the violations themselves are built one by one. ``rules`` selects
+    which of ``RULES`` to run:
+
+    * ``single-pad-net``: nets with exactly one pad.
+    * ``unconnected-pad``: pads that are on no net.
+    * ``shorted-names``: nets given more than one name, e.g. ``'VCC'`` and
+      ``'GND'`` connected together.
+    * ``floating-power``: pads in their component's ``POWER_PADS`` that are
+      unconnected or alone on their net.
+    """
+    netlist = design if isinstance(design, Netlist) else design.build(ir=True)
+    for rule in rules:
+        if rule not in RULES:
+            raise ValueError(f'Unknown ERC rule {rule!r}')
+
+    checker = _Checker(netlist)
+    violations = []
+    for rule in rules:
+        violations.extend(getattr(checker, rule.replace('-', '_'))())
+    return violations
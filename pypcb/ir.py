@@ -0,0 +1,674 @@
+from .ast import Pad, _FIELDS
+from collections import namedtuple
+import json
+import os
+import numpy as np
+
+
+__all__ = ['Netlist']
+
+
+_MAGIC = b'PYPCBIR1'
+_ALIGN = 64
+_ARRAYS = (
+    'component_type', 'component_ref', 'component_name', 'component_path',
+    'component_value', 'component_footprint', 'component_spice_name',
+    'component_spice_model', 'component_src_file', 'component_src_line',
+    'component_pad_ptr', 'pad_component', 'pad_name', 'pad_pin', 'pad_power',
+    'net_ptr', 'net_pads', 'net_label_ptr',
+    'net_labels',
+)
+
+
+_Fragment = namedtuple('_Fragment', (
+    'fingerprint', 'strings', 'columns', 'src_lines', 'pad_ptr', 'pad_component',
+    'pad_name', 'pad_pin', 'pad_power', 'pad_net', 'n_nets', 'label_net', 'label',
+    'net_order', 'own_components', 'own_nets', 'externals', 'children', 'relabel',
+))
+_Fragment.__doc__ = """Netlist of a subtree, shared by the circuits with its fingerprint.
+
+Columns are those of ``Netlist`` without the paths, numbered within the
+subtree and with text as indices into ``strings``. Nets are numbered in
+no particular order: ``pad_net`` is the net of each pad (-1 if not
+connected), ``label_net``/``label`` pair nets and names and
+``net_order`` lists the nets in ``Circuit.get_nets()`` order.
+``externals`` are the nets of the members from outside of the subtree,
+in ``Circuit._get_structure()`` order.
+
+A subtree is its own components and then its subcircuits, so its
+fragment is built from theirs: ``children`` maps each subcircuit name to
+``(fragment, component offset, pad offset, net offset)``, and
+``relabel`` gives the net of each subcircuit net (after the net offset)
+and of the members connected here (numbered after them).
+``own_components`` is the first pad of each own component by name and
+``own_nets`` the net of each net first connected in the circuit itself.
+"""
+
+
+def _find_net(fragment, path, index):
+    # Net of the ``index``-th net first connected in the circuit at ``path``
+    if path:
+        child, component_offset, pad_offset, net_offset = fragment.children[path[0]]
+        return int(fragment.relabel[net_offset + _find_net(child, path[1:], index)])
+    return fragment.own_nets[index]
+
+
+def _find_pad(fragment, path, component, position):
+    # Index of pad ``position`` of the component named ``component`` of
+    # the circuit at ``path``
+    pad = 0
+    for name in path:
+        fragment, component_offset, pad_offset, net_offset = fragment.children[name]
+        pad += pad_offset
+    return pad + fragment.own_components[component] + position
+
+
+def _iter_components(circuit, fragment, prefix):
+    # (Component, hierarchy path) of each component of the fragment of
+    # ``circuit``, in its order. Subtrees elaborated in another process
+    # (pypcb.parallel) have no Component objects and give None.
+    own = [component for name, component in circuit.components] if circuit is not None else []
+    if len(own) != len(fragment.own_components):
+        own = [None] * len(fragment.own_components)
+    for component, name in zip(own, fragment.own_components):
+        yield component, prefix + name
+    subcircuits = dict(circuit.subcircuits) if circuit is not None else {}
+    for name, (child, *offsets) in fragment.children.items():
+        yield from _iter_components(subcircuits.get(name), child, prefix + name + '/')
+
+
+def _get_fragment(circuit, fragments, previous, positions):
+    # Returns the fragment of ``circuit`` from ``fragments``, from
+    # ``previous``, from the last build of the circuit itself (as a root or
+    # in another process, see pypcb.parallel) or built, and adds it to
+    # ``fragments`` with its children
+    fingerprint = circuit.fingerprint()
+    fragment = fragments.get(fingerprint)
+    if fragment is not None:
+        return fragment
+    fragment = previous.get(fingerprint) or circuit._fragments.get(fingerprint)
+    if fragment is None:
+        fragment = _build_fragment(circuit, fingerprint, fragments, previous, positions)
+    stack = [fragment]
+    while stack:
+        fragment = stack.pop()
+        if fragment.fingerprint not in fragments:
+            fragments[fragment.fingerprint] = fragment
+            stack.extend(child for child, *offsets in fragment.children.values())
+    return fragments[fingerprint]
+
+
+def _build_fragment(circuit, fingerprint, fragments, previous, positions):
+    # ``positions`` holds the position of each pad name per pinout table
+    string_index = {}
+
+    def intern(string):
+        return string_index.setdefault(str(string), len(string_index))
+
+    def get_positions(component):
+        pins = component._pads._pins
+        entry = positions.get(id(pins))
+        if entry is None or entry[0] is not pins:
+            entry = positions[id(pins)] = (pins, {name: k for k, name in enumerate(pins)})
+        return entry[1]
+
+    # Own components first. Per class: type, REF (None if computed) and
+    # which of _FIELDS it defines, so fields that only some instances set
+    # don't go through Component.__getattr__. Per pinout table and class: pad names, pins
+    # and power flags.
+    classes = {}
+    pinouts = {}
+    own_components = {}
+    n_own_components = 0
+    columns = ([], [], [], [], [], [], [], [])
+    src_lines = []
+    pad_ptr = [0]
+    pad_name = []
+    pad_pin = []
+    pad_power = []
+    for name, component in circuit.components:
+        own_components[name] = len(pad_name)
+        n_own_components += 1
+        component_class = type(component)
+        info = classes.get(component_class)
+        if info is None:
+            ref = getattr(component_class, 'REF', '')
+            info = classes[component_class] = (
+                intern(f'{component_class.__module__}.{component_class.__qualname__}'),
+                None if hasattr(type(ref), '__get__') else intern(ref),
+                frozenset(name for name in _FIELDS if hasattr(component_class, name)),
+            )
+        type_index, ref_index, class_fields = info
+        attributes = component.__dict__
+        if ref_index is None or 'REF' in attributes:
+            ref_index = intern(getattr(component, 'REF', ''))
+        value, footprint, spice_name, spice_model = (
+            getattr(component, name) if name in class_fields else attributes.get(name, '')
+            for name in _FIELDS
+        )
+        src_file, src_line = component.src_loc or ('', 0)
+        for column, index in zip(columns, (
+            type_index,
+            ref_index,
+            intern(component.name),
+            intern(value),
+            intern(footprint),
+            intern(spice_name),
+            intern(' '.join(spice_model.split())),
+            intern(src_file),
+        )):
+            column.append(index)
+        src_lines.append(src_line)
+
+        pins = component._pads._pins
+        pinout = pinouts.get((id(pins), component_class))
+        if pinout is None or pinout[0] is not pins:
+            power = component.POWER_PADS
+            pinout = pinouts[id(pins), component_class] = (
+                pins,
+                [intern(name) for name in pins],
+                [intern(pin) for pin in pins.values()],
+                [name in power for name in pins],
+            )
+        pad_name += pinout[1]
+        pad_pin += pinout[2]
+        pad_power += pinout[3]
+        pad_ptr.append(len(pad_name))
+    n_own_pads = len(pad_name)
+
+    # Then the subcircuits, whose nets are numbered first
+    children = {}
+    instances = []
+    n_components = n_own_components
+    n_pads = n_own_pads
+    n_elements = 0
+    for name, subcircuit in circuit.subcircuits:
+        child = _get_fragment(subcircuit, fragments, previous, positions)
+        children[name] = (child, n_components, n_pads, n_elements)
+        instances.append((subcircuit, child, n_components, n_pads, n_elements))
+        n_components += len(child.pad_ptr) - 1
+        n_pads += len(child.pad_net)
+        n_elements += child.n_nets
+
+    # Members connected here get the next numbers and are joined with a
+    # union-find
+    parent = {}
+    pad_elements = {}
+    label_elements = {}
+    net_elements = {}
+    external_elements = {}
+    labels = []
+    first_elements = []
+    own_nets, externals = circuit._get_structure()[1:]
+    # Subcircuit -> (fragment, pad offset, net offset, its own nets)
+    direct = {
+        subcircuit: (child, pad_offset, net_offset, subcircuit._get_structure()[1])
+        for subcircuit, child, component_offset, pad_offset, net_offset in instances
+    }
+
+    def new_element():
+        nonlocal n_elements
+        parent[n_elements] = n_elements
+        n_elements += 1
+        return n_elements - 1
+
+    def find(element):
+        root = parent.get(element, element)
+        if root == element:
+            return root
+        while parent.get(root, root) != root:
+            root = parent[root]
+        while element != root:
+            parent[element], element = root, parent[element]
+        return root
+
+    def union(elements):
+        root = None
+        for element in elements:
+            other = find(element)
+            if root is None:
+                root = other
+            elif other != root:
+                parent[other] = root
+
+    def label_element(string):
+        label = intern(string)
+        element = label_elements.get(label)
+        if element is None:
+            element = label_elements[label] = new_element()
+            labels.append((element, label))
+        return element
+
+    def pad_element(pad):
+        element = pad_elements.get(pad)
+        if element is None:
+            element = pad_elements[pad] = new_element()
+        return element
+
+    def get_element(member):
+        if isinstance(member, str):
+            return label_element(member)
+        if isinstance(member, Pad):
+            component = member._owner
+            owner = component._owner
+            if owner is circuit:
+                position = get_positions(component)[member.name]
+                return pad_element(own_components[component.name] + position)
+            entry = direct.get(owner)
+            if entry is not None:
+                child, pad_offset, net_offset, child_nets = entry
+                pad = child.own_components[component.name] + get_positions(component)[member.name]
+                net = int(child.pad_net[pad])
+                return net_offset + net if net >= 0 else pad_element(pad_offset + pad)
+            path = circuit._get_path(owner)
+            if path is not None:
+                child, component_offset, pad_offset, net_offset = children[path[0]]
+                pad = _find_pad(child, path[1:], component.name, get_positions(component)[member.name])
+                net = int(child.pad_net[pad])
+                return net_offset + net if net >= 0 else pad_element(pad_offset + pad)
+        else:
+            owner = member._circuit
+            if owner is circuit:
+                index = own_nets[member]
+                element = net_elements.get(index)
+                if element is None:
+                    element = net_elements[index] = new_element()
+                return element
+            entry = direct.get(owner)
+            if entry is not None:
+                child, pad_offset, net_offset, child_nets = entry
+                return net_offset + child.own_nets[child_nets[member]]
+            path = circuit._get_path(owner)
+            if path is not None:
+                child, component_offset, pad_offset, net_offset = children[path[0]]
+                return net_offset + _find_net(child, path[1:], owner._get_structure()[1][member])
+        index = externals[member]
+        element = external_elements.get(index)
+        if element is None:
+            element = external_elements[index] = new_element()
+        return element
+
+    for connection in circuit.connections:
+        if connection:
+            elements = list(map(get_element, connection))
+            first_elements.append(elements[0])
+            union(elements)
+    for subcircuit, child, component_offset, pad_offset, net_offset in instances:
+        if child.externals:
+            for member, net in zip(subcircuit._get_structure()[2], child.externals):
+                union([net_offset + net, get_element(member)])
+    # Names join nets across subcircuits. Strings of each fragment are
+    # translated once.
+    remaps = {}
+    for subcircuit, child, component_offset, pad_offset, net_offset in instances:
+        remap = remaps.get(child.fingerprint)
+        if remap is None:
+            remap = remaps[child.fingerprint] = (
+                np.array([intern(string) for string in child.strings], dtype=np.int64),
+                [(net, child.strings[label]) for net, label in zip(
+                    child.label_net.tolist(), child.label.tolist()
+                )],
+            )
+        for net, string in remap[1]:
+            union([net_offset + net, label_element(string)])
+
+    roots = np.arange(n_elements)
+    if parent:
+        elements = list(parent)
+        roots[elements] = [find(element) for element in elements]
+    roots, relabel = np.unique(roots, return_inverse=True)
+    relabel = relabel.reshape(-1)
+
+    # Columns of the subtree: the own rows, then those of each subcircuit
+    fingerprints = [child.fingerprint for subcircuit, child, *offsets in instances]
+    distinct = {child.fingerprint: child for subcircuit, child, *offsets in instances}
+
+    def stack(own, get, dtype=np.int64, strings=False):
+        columns = {
+            fingerprint: remaps[fingerprint][0][get(child)] if strings else get(child)
+            for fingerprint, child in distinct.items()
+        }
+        return np.concatenate([np.array(own, dtype=dtype)] + [columns[fingerprint] for fingerprint in fingerprints])
+
+    def shift(own, get, offsets):
+        # Adds its offset to the rows of each subcircuit, -1 is kept
+        sizes = {fingerprint: len(get(child)) for fingerprint, child in distinct.items()}
+        column = stack([], get)
+        offsets = np.repeat(
+            np.array(offsets, dtype=np.int64), [sizes[fingerprint] for fingerprint in fingerprints]
+        )
+        return np.concatenate([
+            np.array(own, dtype=np.int64), np.where(column >= 0, column + offsets, -1)
+        ])
+
+    component_offsets = [instance[2] for instance in instances]
+    net_offsets = [instance[4] for instance in instances]
+
+    pad_elements_column = shift([-1] * n_own_pads, lambda child: child.pad_net, net_offsets)
+    if pad_elements:
+        pad_elements_column[list(pad_elements)] = list(pad_elements.values())
+    pad_net = np.full(n_pads, -1, dtype=np.int64)
+    connected = pad_elements_column >= 0
+    pad_net[connected] = relabel[pad_elements_column[connected]]
+
+    own_labels = np.array(labels, dtype=np.int64).reshape(-1, 2)
+    label_net = relabel[shift(own_labels[:, 0], lambda child: child.label_net, net_offsets)]
+    label = stack(own_labels[:, 1], lambda child: child.label, strings=True)
+    # Each name once per net
+    unique = np.unique(label_net * max(len(string_index), 1) + label, return_index=True)[1]
+    unique.sort()
+
+    net_order = relabel[shift(first_elements, lambda child: child.net_order, net_offsets)]
+    first = np.unique(net_order, return_index=True)[1]
+    first.sort()
+
+    own_pad_counts = np.diff(np.array(pad_ptr, dtype=np.int64))
+    pad_counts = stack(own_pad_counts, lambda child: np.diff(child.pad_ptr))
+    all_pad_ptr = np.zeros(n_components + 1, dtype=np.int64)
+    np.cumsum(pad_counts, out=all_pad_ptr[1:])
+
+    return _Fragment(
+        fingerprint=fingerprint,
+        strings=list(string_index),
+        columns=tuple(
+            stack(column, lambda child, k=k: child.columns[k], strings=True)
+            for k, column in enumerate(columns)
+        ),
+        src_lines=stack(src_lines, lambda child: child.src_lines),
+        pad_ptr=all_pad_ptr,
+        pad_component=shift(
+            np.repeat(np.arange(n_own_components), own_pad_counts),
+            lambda child: child.pad_component, component_offsets,
+        ),
+        pad_name=stack(pad_name, lambda child: child.pad_name, strings=True),
+        pad_pin=stack(pad_pin, lambda child: child.pad_pin, strings=True),
+        pad_power=stack(pad_power, lambda child: child.pad_power, dtype=np.bool_),
+        pad_net=pad_net,
+        n_nets=len(roots),
+        label_net=label_net[unique],
+        label=label[unique],
+        net_order=net_order[first],
+        own_components=own_components,
+        own_nets=relabel[[net_elements[index] for index in range(len(own_nets))]].tolist(),
+        externals=relabel[[external_elements[index] for index in range(len(externals))]].tolist(),
+        children=children,
+        relabel=relabel,
+    )
+
+
+class Netlist:
+    """Integer-indexed netlist of a circuit.
+
+    Components, pads and nets are numbered and described by NumPy arrays;
+    text fields are indices into the ``strings`` table. Pads of component
+    ``i`` are ``component_pad_ptr[i]:component_pad_ptr[i + 1]`` and the
+    pads of net ``j`` are ``net_pads[net_ptr[j]:net_ptr[j + 1]]`` (CSR).
+    Net names given as strings in the connections are kept the same way in
+    ``net_labels``/``net_label_ptr``. Components without a SPICE model
+    have ``''`` as ``component_spice_name`` and ``component_spice_model``.
+    ``component_src_file``/``component_src_line`` are the ``src_loc`` of
+    each component (``''``/0 if not captured) and ``pad_power`` flags the
+    pads listed in ``POWER_PADS``.
+
+    Nets are in ``Circuit.get_nets()`` order, their pads in pad order and
+    their labels by first appearance. Every pad of every component is
+    listed, connected or not.
+
+    Subcircuits with the same ``Circuit.fingerprint()`` are laid out once
+    and copied, and the layouts are kept on the circuit, so building again
+    after a change only lays out the changed subcircuits and their
+    ancestors.
+
+    Built from a circuit with ``Circuit.build(ir=True)``. ``components``
+    then holds the ``Component`` objects by index, ``None`` for those of
+    subcircuits from ``pypcb.parallel.elaborate``, which have none; it is
+    ``None`` for a netlist loaded with ``Netlist.load``.
+    """
+
+    def __init__(self, strings, component_type, component_ref, component_name,
+                 component_path, component_value, component_footprint,
+                 component_spice_name, component_spice_model, component_src_file,
+                 component_src_line, component_pad_ptr, pad_component, pad_name,
+                 pad_pin, pad_power,
+                 net_ptr, net_pads, net_label_ptr, net_labels, components=None):
+        self.strings = strings
+        self.component_type = component_type
+        self.component_ref = component_ref
+        self.component_name = component_name
+        self.component_path = component_path
+        self.component_value = component_value
+        self.component_footprint = component_footprint
+        self.component_spice_name = component_spice_name
+        self.component_spice_model = component_spice_model
+        self.component_src_file = component_src_file
+        self.component_src_line = component_src_line
+        self.component_pad_ptr = component_pad_ptr
+        self.pad_component = pad_component
+        self.pad_name = pad_name
+        self.pad_pin = pad_pin
+        self.pad_power = pad_power
+        self.net_ptr = net_ptr
+        self.net_pads = net_pads
+        self.net_label_ptr = net_label_ptr
+        self.net_labels = net_labels
+        self.components = components
+        self._circuit = None
+        self._version = None
+        self._fragment = None
+        self._rank = None
+        self._pad_net = None
+        self._names = None
+        self._positions = {}
+        self._index = None
+
+    @classmethod
+    def from_circuit(cls, circuit):
+        # Subtrees are laid out once per fingerprint (see _Fragment) and
+        # the layouts are kept on the circuit for the next build
+        fragments = {}
+        fragment = _get_fragment(circuit, fragments, circuit._fragments, {})
+        circuit._fragments = fragments
+        for member in circuit._get_structure()[2]:
+            if isinstance(member, Pad):
+                raise ValueError(f'{member!r} belongs to a component outside of the circuit')
+
+        strings = list(fragment.strings)
+        string_index = {string: i for i, string in enumerate(strings)}
+        try:
+            components = circuit.get_components()
+            paths = components.values()
+        except RuntimeError:
+            # Elaborated subtrees: the paths come from the fragments
+            pairs = list(_iter_components(circuit, fragment, '/'))
+            components = [component for component, path in pairs]
+            paths = [path for component, path in pairs]
+        paths = [string_index.setdefault(path, len(string_index)) for path in paths]
+        strings += list(string_index)[len(strings):]
+
+        # Nets are numbered in get_nets() order
+        n_nets = fragment.n_nets
+        rank = np.empty(n_nets, dtype=np.int64)
+        rank[fragment.net_order] = np.arange(n_nets)
+        connected = np.flatnonzero(fragment.pad_net >= 0)
+        pad_nets = rank[fragment.pad_net[connected]]
+        order = np.argsort(pad_nets, kind='stable')
+        net_ptr = np.zeros(n_nets + 1, dtype=np.int64)
+        np.cumsum(np.bincount(pad_nets, minlength=n_nets), out=net_ptr[1:])
+        label_nets = rank[fragment.label_net]
+        label_order = np.argsort(label_nets, kind='stable')
+        net_label_ptr = np.zeros(n_nets + 1, dtype=np.int64)
+        np.cumsum(np.bincount(label_nets, minlength=n_nets), out=net_label_ptr[1:])
+
+        netlist = cls(
+            strings,
+            *(column.astype(np.int32) for column in fragment.columns[:3]),
+            np.array(paths, dtype=np.int32),
+            *(column.astype(np.int32) for column in fragment.columns[3:]),
+            fragment.src_lines.astype(np.int32),
+            fragment.pad_ptr,
+            fragment.pad_component.astype(np.int32),
+            fragment.pad_name.astype(np.int32),
+            fragment.pad_pin.astype(np.int32),
+            fragment.pad_power,
+            net_ptr, connected[order].astype(np.int32),
+            net_label_ptr, fragment.label[label_order].astype(np.int32),
+            components=list(components),
+        )
+        netlist._circuit = circuit
+        netlist._version = circuit._version
+        netlist._fragment = fragment
+        netlist._rank = rank
+        return netlist
+
+    def save(self, file):
+        """Write the netlist to a binary snapshot.
+
+        The snapshot is a small JSON header followed by the raw arrays, each
+        aligned to 64 bytes, so ``load`` can memory-map it. ``file`` is a
+        path or a binary file object.
+        """
+        encoded = [string.encode('utf-8') for string in self.strings]
+        string_ptr = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(string) for string in encoded], out=string_ptr[1:])
+        arrays = {name: np.ascontiguousarray(getattr(self, name)) for name in _ARRAYS}
+        arrays['string_ptr'] = string_ptr
+        arrays['string_data'] = np.frombuffer(b''.join(encoded), dtype=np.uint8)
+
+        index = {}
+        offset = 0
+        for name, array in arrays.items():
+            index[name] = (array.dtype.str, array.shape, offset)
+            offset += -(-array.nbytes // _ALIGN) * _ALIGN
+        header = json.dumps(index).encode('utf-8')
+        start = -(-(len(_MAGIC) + 8 + len(header)) // _ALIGN) * _ALIGN
+
+        if isinstance(file, (str, os.PathLike)):
+            with open(file, 'wb') as f:
+                return self.save(f)
+        file.write(_MAGIC)
+        file.write(len(header).to_bytes(8, 'little'))
+        file.write(header)
+        file.write(bytes(start - len(_MAGIC) - 8 - len(header)))
+        for name, array in arrays.items():
+            file.write(array.tobytes())
+            file.write(bytes(-array.nbytes % _ALIGN))
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        """Read a snapshot written by ``save``.
+
+        With ``mmap`` the arrays are read-only views of the memory-mapped
+        file instead of copies.
+        """
+        with open(path, 'rb') as f:
+            if f.read(len(_MAGIC)) != _MAGIC:
+                raise ValueError(f'{path} is not a pypcb netlist snapshot')
+            size = int.from_bytes(f.read(8), 'little')
+            index = json.loads(f.read(size))
+        start = -(-(len(_MAGIC) + 8 + size) // _ALIGN) * _ALIGN
+
+        if mmap:
+            data = np.memmap(path, dtype=np.uint8, mode='r')
+        else:
+            data = np.fromfile(path, dtype=np.uint8)
+        arrays = {}
+        for name, (dtype, shape, offset) in index.items():
+            dtype = np.dtype(dtype)
+            count = int(np.prod(shape))
+            offset += start
+            arrays[name] = data[offset:offset + count * dtype.itemsize].view(dtype).reshape(shape)
+
+        string_ptr = arrays.pop('string_ptr').tolist()
+        string_data = arrays.pop('string_data').tobytes()
+        strings = [
+            string_data[begin:end].decode('utf-8')
+            for begin, end in zip(string_ptr, string_ptr[1:])
+        ]
+        return cls(strings, *(arrays[name] for name in _ARRAYS))
+
+    def pad_nets(self):
+        """Return the net of every pad, -1 for unconnected pads."""
+        pad_net = np.full(self.n_pads, -1, dtype=np.int64)
+        pad_net[self.net_pads] = np.repeat(np.arange(self.n_nets), np.diff(self.net_ptr))
+        return pad_net
+
+    @property
+    def n_components(self):
+        return len(self.component_type)
+
+    @property
+    def n_pads(self):
+        return len(self.pad_component)
+
+    @property
+    def n_nets(self):
+        return len(self.net_ptr) - 1
+
+    def component_pads(self, i):
+        return np.arange(self.component_pad_ptr[i], self.component_pad_ptr[i + 1])
+
+    def pads(self, net):
+        return self.net_pads[self.net_ptr[net]:self.net_ptr[net + 1]]
+
+    def labels(self, net):
+        return [self.strings[i] for i in self.net_labels[self.net_label_ptr[net]:self.net_label_ptr[net + 1]]]
+
+    def net_of(self, member):
+        """Return the index of the net of a ``Pad``, ``Net`` or net name.
+
+        Raises ``KeyError`` if it is not connected. Only available on a
+        netlist built from a circuit, while the circuit is unchanged.
+        """
+        circuit = self._get_circuit()
+        if isinstance(member, str):
+            return self._get_names()[member]
+        if isinstance(member, Pad):
+            if self._pad_net is None:
+                self._pad_net = self.pad_nets()
+            net = int(self._pad_net[self.pad_of(member)])
+        else:
+            # Found from the circuit that first connected it, like in
+            # Netlist.from_circuit, or among the members from outside
+            owner = member._circuit
+            path = None if owner is None else circuit._get_path(owner)
+            if path is None:
+                net = self._fragment.externals[circuit._get_structure()[2][member]]
+            else:
+                net = _find_net(self._fragment, path, owner._get_structure()[1][member])
+            net = int(self._rank[net])
+        if net < 0:
+            raise KeyError(member)
+        return net
+
+    def _get_circuit(self):
+        if self._circuit is None:
+            raise RuntimeError('Netlist was not built from a circuit')
+        if self._circuit._version != self._version:
+            raise RuntimeError('The circuit changed since the netlist was built')
+        return self._circuit
+
+    def _get_names(self):
+        # Net of each name, built on first use
+        if self._names is None:
+            label_nets = np.repeat(np.arange(self.n_nets), np.diff(self.net_label_ptr))
+            self._names = {
+                self.strings[label]: j
+                for j, label in zip(label_nets.tolist(), self.net_labels.tolist())
+            }
+        return self._names
+
+    def component_of(self, component):
+        if self._index is None:
+            if self.components is None:
+                raise RuntimeError('Netlist was not built from a circuit')
+            self._index = {c: i for i, c in enumerate(self.components) if c is not None}
+        return self._index[component]
+
+    def pad_of(self, pad):
+        """Return the index of a ``Pad``."""
+        component = pad._owner
+        pins = component._pads._pins
+        entry = self._positions.get(id(pins))
+        if entry is None or entry[0] is not pins:
+            entry = self._positions[id(pins)] = (pins, {name: k for k, name in enumerate(pins)})
+        return int(self.component_pad_ptr[self.component_of(component)]) + entry[1][pad.name]
@@ -3,32 +3,28 @@ from .. import Component
 
 class Resistor(Component):
     REF = 'R'
+    PINOUT = (('1', 'p1'), ('2', 'p2'))
 
     def __init__(self, value, *, name=None, src_loc_at=0):
         super().__init__(name=name, src_loc_at=src_loc_at + 1)
-        self.add_pad('1', 'p1')
-        self.add_pad('2', 'p2')
         self.value = value
 
 
 class Capacitor(Component):
     REF = 'C'
+    PINOUT = (('1', 'p1'), ('2', 'p2'))
 
     def __init__(self, value, *, name=None, src_loc_at=0):
         super().__init__(name=name, src_loc_at=src_loc_at + 1)
-        self.add_pad('1', 'p1')
-        self.add_pad('2', 'p2')
         self.value = value
 
 
 class Transistor(Component):
     REF = 'Q'
+    PINOUT = (('1', 'b'), ('2', 'c'), ('3', 'e'))
 
     def __init__(self, *, name=None, src_loc_at=0):
         super().__init__(name=name, src_loc_at=src_loc_at + 1)
-        self.add_pad('1', 'b')
-        self.add_pad('2', 'c')
-        self.add_pad('3', 'e')
 
 
 class Connector(Component):
@@ -37,5 +33,4 @@ class Connector(Component):
     def __init__(self, n, *, name=None, src_loc_at=0):
         super().__init__(name=name, src_loc_at=src_loc_at + 1)
         self.value = self.name
-        for i in range(n):
-            self.add_pad(f'{i+1}', f'p{i+1}')
+        self.add_pads(range(1, n + 1), 'p{}')
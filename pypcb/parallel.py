@@ -0,0 +1,115 @@
+from .ast import Net, Pad, Circuit
+from .ir import _find_net
+from concurrent.futures import ProcessPoolExecutor
+import hashlib
+import os
+
+
+__all__ = ['ElaboratedCircuit', 'elaborate']
+
+
+class ElaboratedCircuit(Circuit):
+    """A circuit reduced to its netlist layout, as returned by ``elaborate``.
+
+    Keeps the ``pypcb.ir`` layout of the circuit it was made from and, for
+    each public ``Net`` attribute of that circuit connected in it (its
+    ports), a new ``Net`` attribute of the same name. It pickles as a few
+    arrays per distinct subcircuit instead of every component, pad and net.
+
+    Attach it with ``parent.subcircuits[name] = circuit`` and connect its
+    ports from the parent. ``Circuit.build(ir=True)``, and so the KiCad
+    backend and the ERC, then include its components and nets, and
+    ``NgSpice`` simulates the parent from that ``Netlist``. It has no
+    ``Component`` objects: they are ``None`` in the ``components`` of the
+    parent's ``Netlist`` and ``get_nets()``, ``get_components()`` and the
+    other walks of the parent's objects raise ``RuntimeError``. It must
+    not be modified.
+    """
+
+    def __init__(self, circuit):
+        super().__init__()
+        circuit.build(ir=True)
+        fingerprint = circuit.fingerprint()
+        fragments = dict(circuit._fragments)
+        fragment = fragments.pop(fingerprint)
+
+        self._ports = []
+        port_nets = []
+        for name, net in vars(circuit).items():
+            if name.startswith('_') or not isinstance(net, Net) or isinstance(net, Pad):
+                continue
+            owner = net._circuit
+            path = None if owner is None else circuit._get_path(owner)
+            if path is None:
+                continue
+            port = Net(name=name)
+            port._circuit = self
+            setattr(self, name, port)
+            self._ports.append(port)
+            port_nets.append(_find_net(fragment, path, owner._get_structure()[1][net]))
+
+        # The ports replace the nets of the circuit itself
+        self._digest = hashlib.sha256(repr((
+            'ElaboratedCircuit', fingerprint, [port.name for port in self._ports],
+        )).encode('utf-8')).hexdigest()
+        fragments[self._digest] = fragment._replace(
+            fingerprint=self._digest, own_nets=port_nets, externals=[]
+        )
+        self._fragments = fragments
+
+    def __getstate__(self):
+        # The layout is all there is to it
+        state = super().__getstate__()
+        state['_fragments'] = self._fragments
+        return state
+
+    def _build_structure(self):
+        return self._digest, {port: i for i, port in enumerate(self._ports)}, {}
+
+    def _objects_error(self):
+        return RuntimeError(
+            f'{self._name or self!r} was built by pypcb.parallel.elaborate and has no '
+            f'Component objects, use build(ir=True)'
+        )
+
+    def _iter_connections(self):
+        raise self._objects_error()
+
+    def _add_components(self, components, prefix):
+        raise self._objects_error()
+
+
+def _elaborate(factory):
+    circuit = factory()
+    if not isinstance(circuit, Circuit):
+        raise ValueError(f'{circuit} must be a Circuit')
+    if circuit._owner is not None:
+        raise ValueError(f'{circuit} is already a subcircuit')
+    return ElaboratedCircuit(circuit)
+
+
+def elaborate(factories, workers=None):
+    """Build independent circuits in parallel.
+
+    ``factories`` are picklable callables (a ``Circuit`` subclass, a
+    module-level function, a ``functools.partial`` of either...) that each
+    return a new top-level ``Circuit``. They are called in a process pool
+    of ``workers`` processes (default: the number of CPUs), so component
+    construction, net resolution and netlist layout of every subtree run on
+    their own core. Each circuit comes back as an ``ElaboratedCircuit``
+    with the same ports, which only carries its netlist layout, and is
+    merged into a parent as usual with ``parent.subcircuits[name] =
+    circuit``.
+
+    The circuits are returned in the order of ``factories``, also when
+    built in this process (``workers`` of 1). A factory must not use nets
+    or components created in the calling process: the copies it would get
+    are not the caller's objects. Connect the returned circuits from the
+    parent instead.
+    """
+    factories = list(factories)
+    workers = min(workers or os.cpu_count(), len(factories))
+    if workers <= 1:
+        return [_elaborate(factory) for factory in factories]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(_elaborate, factories))
@@ -1,10 +1,11 @@
 # Copyright (C) 2019-2021 Amaranth HDL contributors
 
 import sys
-from opcode import opname
+from bisect import bisect_right
+from dis import get_instructions
 
 
-__all__ = ["NameNotFound", "get_var_name", "get_src_loc"]
+__all__ = ["NameNotFound", "get_var_name", "get_src_loc", "capture_src_loc"]
 
 
 class NameNotFound(Exception):
@@ -12,46 +13,77 @@ class NameNotFound(Exception):
 
 
 _raise_exception = object()
+_not_a_call = object()
+_not_found = object()
+
+# Set to False to skip source location capture (``src_loc`` is None) in
+# production batch builds.
+capture_src_loc = True
+
+_CALL_OPS = (
+    "CALL_FUNCTION", "CALL_FUNCTION_KW", "CALL_FUNCTION_EX", "CALL_METHOD",
+    "CALL", "CALL_KW",
+)
+_STORE_OPS = ("STORE_NAME", "STORE_ATTR", "STORE_FAST", "STORE_DEREF", "STORE_GLOBAL")
+_SKIP_OPS = (
+    "LOAD_GLOBAL", "LOAD_NAME", "LOAD_ATTR", "LOAD_FAST", "LOAD_FAST_CHECK",
+    "LOAD_FAST_BORROW", "LOAD_DEREF", "DUP_TOP", "BUILD_LIST", "COPY", "NOP",
+    "EXTENDED_ARG", "CACHE",
+)
+
+# code object -> (instruction offsets, instructions)
+_instructions = {}
+# (code object, f_lasti) -> variable name, _not_a_call or _not_found
+_names = {}
+
+
+def _get_instructions(code):
+    try:
+        return _instructions[code]
+    except KeyError:
+        instructions = list(get_instructions(code))
+        offsets = [instruction.offset for instruction in instructions]
+        _instructions[code] = offsets, instructions
+        return offsets, instructions
+
+
+def _find_var_name(code, call_offset):
+    offsets, instructions = _get_instructions(code)
+    index = bisect_right(offsets, call_offset) - 1
+    while instructions[index].opname == "EXTENDED_ARG":
+        index += 1
+    if instructions[index].opname not in _CALL_OPS:
+        return _not_a_call
+
+    for instruction in instructions[index + 1:]:
+        if instruction.opname in _STORE_OPS:
+            return instruction.argval
+        elif instruction.opname not in _SKIP_OPS:
+            break
+    return _not_found
 
 
 def get_var_name(depth=2, default=_raise_exception):
     frame = sys._getframe(depth)
-    code = frame.f_code
-    call_index = frame.f_lasti
-    while True:
-        call_opc = opname[code.co_code[call_index]]
-        if call_opc in ("EXTENDED_ARG",):
-            call_index += 2
-        else:
-            break
-    if call_opc not in ("CALL_FUNCTION", "CALL_FUNCTION_KW", "CALL_FUNCTION_EX", "CALL_METHOD"):
-        return None
+    key = (frame.f_code, frame.f_lasti)
+    name = _names.get(key)
+    if name is None:
+        name = _names[key] = _find_var_name(*key)
 
-    index = call_index + 2
-    while True:
-        opc = opname[code.co_code[index]]
-        if opc in ("STORE_NAME", "STORE_ATTR"):
-            name_index = int(code.co_code[index + 1])
-            return code.co_names[name_index]
-        elif opc == "STORE_FAST":
-            name_index = int(code.co_code[index + 1])
-            return code.co_varnames[name_index]
-        elif opc == "STORE_DEREF":
-            name_index = int(code.co_code[index + 1])
-            return code.co_cellvars[name_index]
-        elif opc in ("LOAD_GLOBAL", "LOAD_NAME", "LOAD_ATTR", "LOAD_FAST", "LOAD_DEREF",
-                     "DUP_TOP", "BUILD_LIST"):
-            index += 2
-        else:
-            if default is _raise_exception:
-                raise NameNotFound
-            else:
-                return default
+    if name is _not_a_call:
+        return None
+    if name is _not_found:
+        if default is _raise_exception:
+            raise NameNotFound
+        return default
+    return name
 
 
 def get_src_loc(src_loc_at=0):
     # n-th  frame: get_src_loc()
     # n-1th frame: caller of get_src_loc() (usually constructor)
     # n-2th frame: caller of caller (usually user code)
+    if not capture_src_loc:
+        return None
     frame = sys._getframe(2 + src_loc_at)
     return (frame.f_code.co_filename, frame.f_lineno)
@@ -6,4 +6,7 @@ setup(
     author="ademski",
     email="andresdemski@gmail.com",
     packages=find_packages(),
+    entry_points={
+        'console_scripts': ['pypcb-bench = pypcb.bench:main'],
+    },
 )
@@ -0,0 +1,47 @@
+"""Circuits shared by the tests."""
+from pypcb import Net, Circuit, Board
+from pypcb.back.ngspice import VoltageSource
+from pypcb.lib.generic import Resistor, Connector
+
+
+class Divider(Circuit):
+    def __init__(self, ratio=1):
+        super().__init__()
+        self.input = Net(name='input')
+        self.output = Net(name='output')
+        self.gnd = Net(name='gnd')
+        # Not connected in the divider
+        self.spare = Net(name='spare')
+        self.top = Resistor(1e3 * ratio, name='top')
+        self.bottom = Resistor(1e3, name='bottom')
+        self.connections += [
+            (self.input, self.top.p1),
+            (self.top.p2, self.bottom.p1, self.output),
+            (self.bottom.p2, self.gnd),
+        ]
+
+
+class Chain(Board):
+    # Dividers in series, fed and grounded through a connector
+    def __init__(self, ratios):
+        super().__init__()
+        conn = Connector(2, name='conn')
+        dividers = [Divider(ratio) for ratio in ratios]
+        for i, divider in enumerate(dividers):
+            self.subcircuits[f'd{i}'] = divider
+            self.connections += [(divider.gnd, conn.p2, 'GND')]
+        for left, right in zip(dividers, dividers[1:]):
+            self.connections += [(left.output, right.input)]
+        self.connections += [(conn.p1, dividers[0].input)]
+        self.dividers = dividers
+
+
+class Bench(Board):
+    # Dividers in parallel on a voltage source, for the simulations
+    def __init__(self, ratios):
+        super().__init__()
+        self.source = VoltageSource(5, name='source')
+        self.dividers = [Divider(ratio) for ratio in ratios]
+        for i, divider in enumerate(self.dividers):
+            self.subcircuits[f'd{i}'] = divider
+            self.connections += [(self.source.p, divider.input), (self.source.n, divider.gnd, 'GND')]
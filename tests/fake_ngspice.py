@@ -0,0 +1,126 @@
+"""Stand-in for the ngspice executable, for the tests.
+
+Handles the command lines pypcb runs: ``-s`` (deck on stdin, raw data on
+stdout), ``-b -r RAW DECK`` and ``-p`` (interactive commands on stdin).
+The plot has the scale of the analysis and, for each saved node, the value
+of the first resistor of the deck at every point. Each run is appended to
+the file named by ``$FAKE_NGSPICE_LOG`` as a JSON line.
+"""
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+
+UNITS = {'ns': 1e-9, 'us': 1e-6, 'ms': 1e-3, 's': 1}
+
+
+def parse_time(value):
+    for unit in ('ns', 'us', 'ms', 's'):
+        if value.endswith(unit):
+            return float(value[:-len(unit)]) * UNITS[unit]
+    return float(value)
+
+
+def get_scale(analysis):
+    fields = analysis.lstrip('.').split()
+    if fields[0] == 'dc':
+        start, stop, inc = map(float, fields[2:5])
+        return 'v-sweep', np.arange(start, stop + inc / 2, inc)
+    if fields[0] == 'tran':
+        step, stop = map(parse_time, fields[1:3])
+        return 'time', np.arange(0, stop + step / 2, step)
+    if fields[0] == 'ac':
+        start, stop = map(float, fields[3:5])
+        return 'frequency', np.geomspace(start, stop, 3) + 0j
+    raise ValueError(analysis)
+
+
+def get_raw(deck, save, analysis, n_points):
+    scale_name, scale = get_scale(analysis)
+    value = next(float(line.split()[3]) for line in deck if line.startswith('R'))
+    columns = [scale] + [np.full(len(scale), value, dtype=scale.dtype) for node in save]
+    names = [scale_name] + [f'v({node})' for node in save]
+    flags = 'complex' if scale.dtype.kind == 'c' else 'real'
+    header = [
+        'Title: fake',
+        'Plotname: fake',
+        f'Flags: {flags}',
+        f'No. Variables: {len(names)}',
+        f'No. Points: {len(scale) if n_points else 0}',
+        'Variables:',
+    ] + [f'\t{i}\t{name}\tvoltage' for i, name in enumerate(names)] + ['Binary:', '']
+    return '\n'.join(header).encode('utf-8') + np.stack(columns, axis=1).tobytes()
+
+
+def get_cards(deck):
+    save = next(line.split()[1:] for line in deck if line.startswith('.save'))
+    analysis = next(
+        line for line in deck if line.split()[0] in ('.dc', '.tran', '.ac')
+    )
+    return save, analysis
+
+
+def log(**entry):
+    path = os.environ.get('FAKE_NGSPICE_LOG')
+    if path:
+        with open(path, 'a') as f:
+            f.write(json.dumps(entry) + '\n')
+
+
+def session():
+    deck = []
+    save = []
+    analysis = None
+    commands = []
+    for line in sys.stdin:
+        command = line.strip()
+        commands.append(command)
+        name, _, args = command.partition(' ')
+        if name == 'source':
+            with open(args) as f:
+                deck = f.read().splitlines()
+        elif name == 'destroy':
+            analysis = None
+        elif name == 'save':
+            save = args.split()
+        elif name in ('dc', 'tran', 'ac'):
+            analysis = command
+        elif name == 'alter':
+            ref, value = args.replace(' ', '').split('=')
+            deck = [
+                ' '.join(line.split()[:3] + [value]) if line.split()[:1] == [ref] else line
+                for line in deck
+            ]
+        elif name == 'write':
+            with open(args, 'wb') as f:
+                f.write(get_raw(deck, save, analysis, True))
+        elif name == 'echo':
+            print(args, flush=True)
+        elif name == 'quit':
+            break
+    log(argv=sys.argv[1:], commands=commands)
+
+
+def main():
+    args = sys.argv[1:]
+    if args == ['-p']:
+        return session()
+    start = time.time()
+    if args == ['-s']:
+        deck = sys.stdin.read().splitlines()
+        sys.stdout.buffer.write(get_raw(deck, *get_cards(deck), False))
+    else:
+        raw, path = args[args.index('-r') + 1], args[-1]
+        with open(path) as f:
+            deck = f.read().splitlines()
+        with open(raw, 'wb') as f:
+            f.write(get_raw(deck, *get_cards(deck), True))
+    time.sleep(float(os.environ.get('FAKE_NGSPICE_DELAY', 0)))
+    log(argv=args, deck=deck, start=start, end=time.time())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+from pypcb import Board
+from pypcb.back.kicad import generate_netlist, read_netlist
+from pypcb.diff import ComponentChange, PadMove, diff
+from pypcb.lib.generic import Resistor
+
+
+class Ladder(Board):
+    # Resistors in series from 'IN' to 'GND', tapped at 'TAP'
+    def __init__(self, values=(1e3, 1e3, 1e3), tap=1):
+        super().__init__()
+        self.resistors = [Resistor(value, name=f'r{i}') for i, value in enumerate(values)]
+        self.connections += [(self.resistors[0].p1, 'IN'), (self.resistors[-1].p2, 'GND')]
+        for i, (left, right) in enumerate(zip(self.resistors, self.resistors[1:])):
+            if i == tap:
+                self.connections += [(left.p2, right.p1, 'TAP')]
+            else:
+                self.connections += [(left.p2, right.p1)]
+
+
+def test_same():
+    changes = diff(Ladder(), Ladder())
+    assert not changes
+    assert changes == ((), (), (), (), ())
+
+
+def test_components():
+    changes = diff(Ladder(), Ladder((1e3, 2e3, 1e3, 1e3)))
+    assert changes.added == ('/r3',)
+    assert changes.removed == ()
+    assert changes.changed == (ComponentChange('/r1', 'value', '1000.0', '2000.0'),)
+    # The net of r2.p2 is kept, with r3.p1 on it
+    assert changes.moved == ()
+    assert diff(Ladder((1e3, 1e3, 1e3, 1e3)), Ladder()).removed == ('/r3',)
+
+
+def test_moved_and_renamed():
+    new = Ladder()
+    new.connections += [(new.resistors[0].p2, 'GND')]
+    changes = diff(Ladder(), new)
+    # The joined net is the one of r0.p2 and r1.p1, which got the name of
+    # the net r2.p2 moved from
+    assert changes.moved == (PadMove('/r2', 'p2', 'GND', 'GND'),)
+    assert [new_name for old_name, new_name in changes.renamed] == ['GND']
+    # The name moves to the other net
+    renamed = diff(Ladder(tap=0), Ladder(tap=1)).renamed
+    assert [name for names in renamed for name in names].count('TAP') == 2
+
+
+def test_kicad():
+    old = generate_netlist(Ladder())
+    assert diff(read_netlist(old), Ladder(tap=0)) == diff(Ladder(), Ladder(tap=0))
+
+    # Renames, including one that only adds a repeat suffix
+    assert diff(read_netlist(old.replace('"TAP"', '"MID"')), Ladder()).renamed == (('MID', 'TAP'),)
+    assert not diff(read_netlist(old.replace('"TAP"', '"TAP_1"')), Ladder())
+
+    # A ref fixed by hand is kept, unless compared with fresh refs
+    edited = read_netlist(old.replace('"R2"', '"R7"'))
+    assert not diff(edited, Ladder())
+    assert diff(edited, Ladder(), components_map={}).changed == (
+        ComponentChange('/r2', 'ref', 'R7', 'R2'),
+    )
+
+    # A node missing from the netlist is a pad that got connected
+    lines = old.splitlines(keepends=True)
+    node = next(i for i, line in enumerate(lines) if '(node (ref "R1") (pin "1")' in line)
+    removed = read_netlist(''.join(lines[:node] + lines[node + 1:]))
+    assert diff(removed, Ladder()).moved == (PadMove('/r0', 'p1', None, 'IN'),)
@@ -0,0 +1,41 @@
+from pypcb import Circuit, Component
+from pypcb.erc import check
+
+
+class Part(Component):
+    REF = 'U'
+    PINOUT = (('1', 'vcc'), ('2', 'gnd'), ('3', 'a'))
+    POWER_PADS = ('vcc', 'gnd')
+
+
+def rules(violations):
+    return sorted((v.rule, v.message) for v in violations)
+
+
+def test_floating_power_without_nets():
+    board = Circuit()
+    board.components += Part(name='u1')
+    violations = check(board, rules=('floating-power',))
+    assert rules(violations) == [
+        ('floating-power', 'Power pad /u1.gnd is floating'),
+        ('floating-power', 'Power pad /u1.vcc is floating'),
+    ]
+    assert all(v.net is None for v in violations)
+
+
+def test_rules():
+    board = Circuit()
+    u1 = Part(name='u1')
+    u2 = Part(name='u2')
+    board.connections += [
+        (u1.vcc, u2.vcc, 'VCC', 'VDD'),
+        (u1.gnd, 'GND'),
+        (u1.a, u2.a),
+    ]
+    assert rules(check(board)) == [
+        ('floating-power', 'Power pad /u1.gnd is floating'),
+        ('floating-power', 'Power pad /u2.gnd is floating'),
+        ('shorted-names', 'Net names VCC, VDD are shorted together'),
+        ('single-pad-net', 'Net GND only connects /u1.gnd'),
+        ('unconnected-pad', 'Pad /u2.gnd (pin 2) is not connected'),
+    ]
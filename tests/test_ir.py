@@ -0,0 +1,185 @@
+import io
+
+import numpy as np
+import pytest
+
+from pypcb import Net, Component, Circuit, Board
+from pypcb.back.kicad import generate_netlist
+from pypcb.back.ngspice import NgSpice
+from pypcb.erc import check
+from pypcb.ir import Netlist, _ARRAYS
+from pypcb.lib.generic import Resistor
+
+from circuits import Bench, Chain, Divider
+
+
+def nets(netlist):
+    strings = netlist.strings
+    paths = netlist.component_path.tolist()
+    components = netlist.pad_component.tolist()
+    names = netlist.pad_name.tolist()
+    return [
+        (
+            [f'{strings[paths[components[p]]]}.{strings[names[p]]}' for p in netlist.pads(j).tolist()],
+            netlist.labels(j),
+        )
+        for j in range(netlist.n_nets)
+    ]
+
+
+def test_fingerprint():
+    assert Divider().fingerprint() == Divider().fingerprint()
+    assert Divider(2).fingerprint() != Divider().fingerprint()
+    assert Chain([1, 1]).fingerprint() != Chain([1, 1, 1]).fingerprint()
+
+
+def test_from_circuit():
+    netlist = Chain([1, 2]).build(ir=True)
+    assert [netlist.strings[i] for i in netlist.component_path.tolist()] == [
+        '/conn', '/d0/top', '/d0/bottom', '/d1/top', '/d1/bottom',
+    ]
+    # In get_nets() order, pads in pad order
+    assert nets(netlist) == [
+        (['/conn.p2', '/d0/bottom.p2', '/d1/bottom.p2'], ['GND']),
+        (['/d0/top.p2', '/d0/bottom.p1', '/d1/top.p1'], []),
+        (['/conn.p1', '/d0/top.p1'], []),
+        (['/d1/top.p2', '/d1/bottom.p1'], []),
+    ]
+    assert netlist.net_of(netlist.components[1].p2) == 1
+
+
+def test_rebuild_after_change():
+    board = Chain([1, 1, 1])
+    board.build(ir=True)
+    board.dividers[1].connections += [(board.dividers[1].output, 'MID')]
+    board.dividers[2].top.value = 2e3
+    expected = Chain([1, 1, 1])
+    expected.dividers[1].connections += [(expected.dividers[1].output, 'MID')]
+    expected.dividers[2].top.value = 2e3
+
+    netlist = board.build(ir=True)
+    assert nets(netlist) == nets(expected.build(ir=True))
+    assert netlist.strings[netlist.component_value[5]] == '2000.0'
+
+
+def test_net_of():
+    board = Chain([1, 2])
+    outside = Net(name='outside')
+    other = Circuit()
+    other.connections += [(outside,)]
+    board.connections += [(outside, board.dividers[1].output)]
+    netlist = board.build(ir=True)
+    for j, net in enumerate(board.get_nets(clean_nets=False)):
+        for member in net:
+            assert netlist.net_of(member) == j
+    with pytest.raises(KeyError):
+        netlist.net_of(Net(name='unconnected'))
+    with pytest.raises(KeyError):
+        netlist.net_of('VCC')
+    board.connections += [('VCC',)]
+    with pytest.raises(RuntimeError):
+        netlist.net_of('GND')
+
+
+def test_connectivity():
+    board = Chain([1, 2])
+    conn = board.components._components['conn']
+    unused = Resistor(1e3, name='unused')
+    board.components += unused
+    index = board.build(index=True)
+    divider = board.dividers[0]
+    assert len(index) == 4
+    assert index.net_named('GND') == index.net(conn.p2) == 0
+    assert index.pads(2) == (conn.p1, divider.top.p1)
+    assert index.neighbours(conn.p1) == (divider.top.p1,)
+    assert index.net_components(0)[:2] == (conn, divider.components._components['bottom'])
+    assert index.component_nets(divider.top) == (1, 2)
+    assert index.unconnected_pads() == (unused.p1, unused.p2)
+
+
+class Part(Component):
+    def __init__(self, ref, name):
+        super().__init__(name=name)
+        self.REF = ref
+        self.add_pads([('1', 'a'), ('2', 'b')])
+
+
+class Single(Circuit):
+    def __init__(self, ref):
+        super().__init__()
+        self.part = Part(ref, name='part')
+        self.connections += [(self.part.a, 'A'), (self.part.b, 'B')]
+
+
+def test_instance_ref():
+    assert Single('U').fingerprint() != Single('D').fingerprint()
+    board = Board()
+    board.subcircuits['u'] = Single('U')
+    board.subcircuits['d'] = Single('D')
+    netlist = board.build(ir=True)
+    assert [netlist.strings[i] for i in netlist.component_ref.tolist()] == ['U', 'D']
+
+    single = Single('U')
+    fingerprint = single.fingerprint()
+    single.part.REF = 'D'
+    assert single.fingerprint() == Single('D').fingerprint() != fingerprint
+
+
+def test_rebuild_after_pinout_change():
+    board = Chain([1])
+    netlist = board.build(ir=True)
+    top = board.dividers[0].top
+    top.add_pad('3', 'p3')
+    rebuilt = board.build(ir=True)
+    assert rebuilt.n_pads == netlist.n_pads + 1
+    assert [
+        (violation.rule, violation.components) for violation in check(rebuilt)
+    ] == [('unconnected-pad', ('/d0/top',))]
+    top.add_pads([('4', 'p4')])
+    assert board.build(ir=True).n_pads == netlist.n_pads + 2
+
+
+def assert_same_netlist(netlist, expected):
+    assert netlist.strings == expected.strings
+    for name in _ARRAYS:
+        np.testing.assert_array_equal(getattr(netlist, name), getattr(expected, name))
+
+
+@pytest.mark.parametrize('mmap', [True, False])
+def test_save_load(tmp_path, mmap):
+    board = Chain([1, 2])
+    netlist = board.build(ir=True)
+    path = tmp_path / 'board.pcbnl'
+    netlist.save(path)
+    buffer = io.BytesIO()
+    netlist.save(buffer)
+    assert buffer.getvalue() == path.read_bytes()
+
+    loaded = Netlist.load(path, mmap=mmap)
+    assert loaded.components is None
+    assert_same_netlist(loaded, netlist)
+    assert generate_netlist(loaded) == generate_netlist(board)
+    with pytest.raises(RuntimeError):
+        loaded.net_of('GND')
+
+    # Also by name, from a str path
+    assert_same_netlist(Netlist.load(str(path), mmap=mmap), netlist)
+
+
+def test_save_load_empty(tmp_path):
+    path = tmp_path / 'empty.pcbnl'
+    Board().build(ir=True).save(path)
+    loaded = Netlist.load(path)
+    assert (loaded.n_components, loaded.n_pads, loaded.n_nets) == (0, 0, 0)
+    assert loaded.strings == []
+    assert generate_netlist(loaded) == generate_netlist(Board())
+
+
+def test_load_simulate(tmp_path):
+    board = Bench([1, 2])
+    path = tmp_path / 'board.pcbnl'
+    board.build(ir=True).save(path)
+    spice = NgSpice(Netlist.load(path), 'GND')
+    expected = NgSpice(board, 'GND')
+    assert spice.circuit == expected.circuit
+    assert spice.get_dot_save(['GND', 2]) == expected.get_dot_save(['GND', board.dividers[0].output])
@@ -0,0 +1,80 @@
+import io
+
+import pytest
+
+from pypcb.back.kicad import (
+    _iter_tokens, generate_netlist, read_components_map, read_netlist, update_netlist,
+)
+
+from circuits import Chain
+
+
+def n_blocks(board):
+    netlist = board.build(ir=True)
+    return netlist.n_components + netlist.n_nets
+
+
+def test_update_netlist(tmp_path):
+    path = tmp_path / 'board.net'
+    path.write_bytes(generate_netlist(Chain([1, 1, 1])).encode('utf-8'))
+    board = Chain([1, 1, 1, 2])
+    board.dividers[1].top.value = 2e3
+    board.connections += [(board.dividers[2].output, 'MID')]
+
+    expected = generate_netlist(board, read_components_map(path))
+    reused, rewritten = update_netlist(board, path)
+    assert path.read_bytes() == expected.encode('utf-8')
+    assert reused and rewritten
+    assert update_netlist(board, path) == (n_blocks(board), 0)
+    assert path.read_bytes() == expected.encode('utf-8')
+
+
+def test_update_netlist_fallback(tmp_path):
+    # Not laid out like write_netlist: a netlist saved by another tool,
+    # with a ref changed by hand, and an empty file
+    path = tmp_path / 'board.net'
+    text = generate_netlist(Chain([1, 1]))
+    text = text.replace('\n      ', ' ').replace('(ref "R2")', '(ref "R9")')
+    board = Chain([1, 2])
+    for data in (text, ''):
+        path.write_bytes(data.encode('utf-8'))
+        expected = generate_netlist(board, read_components_map(path))
+        assert update_netlist(board, path) == (0, n_blocks(board))
+        assert path.read_bytes() == expected.encode('utf-8')
+        assert ('(ref "R9")' in expected) == bool(data)
+    assert not (tmp_path / 'board.net.tmp').exists()
+
+
+# Quoted atoms with spaces, newlines, brackets, escaped quotes and
+# multi-byte characters, so small chunks cut through all of them
+SEXPR = '(export (design (source "a b\n(c)")) (nets (net (name "R\\"1 \u00b5\u2192") (node (ref "R1")))))\n'
+
+
+@pytest.mark.parametrize('binary', [False, True])
+def test_iter_tokens_chunks(binary):
+    data = SEXPR.encode('utf-8') if binary else SEXPR
+    expected = [token for tokens in _iter_tokens(io.StringIO(SEXPR)) for token in tokens]
+    assert '"a b\n(c)"' in expected
+    for chunk_size in range(1, len(data) + 1):
+        stream = io.BytesIO(data) if binary else io.StringIO(data)
+        tokens = [token for tokens in _iter_tokens(stream, chunk_size) for token in tokens]
+        assert tokens == expected, chunk_size
+    assert read_netlist(data)['export']['nets'][0]['name'] == 'R"1 \u00b5\u2192'
+
+
+def test_iter_tokens_unterminated():
+    with pytest.raises(ValueError):
+        read_netlist('(export (design (source "a b)))\n')
+
+
+def test_read_arguments(tmp_path):
+    # A str is the netlist text for both readers, paths are os.PathLike
+    text = generate_netlist(Chain([1, 2]))
+    path = tmp_path / 'board.net'
+    path.write_text(text)
+    components_map = read_components_map(text)
+    assert components_map['/d1/top'] == 'R3'
+    assert read_components_map(path) == read_components_map(text.encode('utf-8')) == components_map
+    with open(path, 'rb') as f:
+        assert read_components_map(f) == components_map
+    assert read_netlist(path) == read_netlist(text)
@@ -0,0 +1,364 @@
+import asyncio
+import json
+import os
+import sys
+
+import numpy as np
+import pytest
+
+from pypcb import Net, Circuit, Board
+from pypcb.back.ngspice import NgSpice, SimulationCache, VoltageSource, read_raw
+from pypcb.lib.generic import Resistor
+
+from circuits import Bench, Divider
+
+
+def raw_data(n_points, rows, flags='real'):
+    header = (
+        'Circuit: test\n'
+        'Doing analysis at TEMP = 27.000000 and TNOM = 27.000000\n'
+        'Title: test\n'
+        'Date: Thu Jan  1 00:00:00  1970\n'
+        'Plotname: DC transfer characteristic\n'
+        f'Flags: {flags}\n'
+        'No. Variables: 2\n'
+        f'No. Points: {n_points}\n'
+        'Variables:\n'
+        '\t0\tv-sweep\tvoltage\n'
+        '\t1\tv(1)\tvoltage\n'
+        'Binary:\n'
+    )
+    dtype = np.complex128 if flags == 'complex' else np.float64
+    return header.encode('utf-8') + np.asarray(rows, dtype=dtype).tobytes()
+
+
+def test_read_raw_piped_output_without_point_count():
+    # ngspice -s leaves the "No. Points: 0" placeholder in the header
+    sweep = np.linspace(-5, 5, 11)
+    data = read_raw(raw_data(0, np.stack([sweep, sweep / 2], axis=1)))
+    assert data.shape == (11,)
+    assert data.dtype.names == ('v-sweep', 'v(1)')
+    np.testing.assert_array_equal(data['v-sweep'], sweep)
+    np.testing.assert_array_equal(data['v(1)'], sweep / 2)
+
+
+def test_read_raw_uses_point_count():
+    rows = [[i, 2 * i] for i in range(5)]
+    assert read_raw(raw_data(3, rows)).shape == (3,)
+
+
+def test_read_raw_file(tmp_path):
+    path = tmp_path / 'result.raw'
+    path.write_bytes(raw_data(4, [[i, 2 * i] for i in range(4)]))
+    for mmap in (False, True):
+        data = read_raw(path, mmap=mmap)
+        np.testing.assert_array_equal(data['v(1)'], [0, 2, 4, 6])
+
+
+def test_read_raw_complex():
+    data = read_raw(raw_data(0, [[1, 1 + 1j], [10, 2 - 1j]], flags='complex'))
+    np.testing.assert_array_equal(data['v(1)'], [1 + 1j, 2 - 1j])
+
+
+class Load(Circuit):
+    # Connected to the supply by name only
+    def __init__(self):
+        super().__init__()
+        top = Resistor(1e3, name='top')
+        bottom = Resistor(2e3, name='bottom')
+        self.connections += [('VCC', top.p1), (top.p2, bottom.p1), (bottom.p2, 'GND'), ('UNUSED',)]
+
+
+def test_hierarchical_labels():
+    board = Board()
+    source = VoltageSource(5, name='source')
+    board.subcircuits['a'] = Load()
+    board.subcircuits['b'] = Load()
+    board.connections += [(source.p, 'VCC'), (source.n, 'GND')]
+    spice = NgSpice(board, gnd='GND', hierarchical=True)
+    assert spice.circuit.splitlines() == [
+        '.subckt load 1',
+        'R1 1 2 1000.0',
+        'R2 2 0 2000.0',
+        '.ends load',
+        'V1 1 0 5',
+        'X1 1 load',
+        'X2 1 load',
+    ]
+    assert spice.get_dot_save(['VCC']) == '.save 1'
+
+
+def test_hierarchical():
+    board = Bench([1, 1, 2])
+    spice = NgSpice(board, 'GND', hierarchical=True)
+    # One definition per distinct contents, ground is node 0 and not a port
+    assert spice.circuit.splitlines() == [
+        '.subckt divider 1',
+        'R1 1 2 1000.0',
+        'R2 2 0 1000.0',
+        '.ends divider',
+        '.subckt divider_0 1',
+        'R1 1 2 2000.0',
+        'R2 2 0 1000.0',
+        '.ends divider_0',
+        'V1 1 0 5',
+        'X1 1 divider',
+        'X2 1 divider',
+        'X3 1 divider_0',
+    ]
+    dividers = board.dividers
+    assert spice.get_dot_save([dividers[1].output, dividers[2].output, 'GND']) == '.save X2.2 X3.2 0'
+    assert spice._comp_map[board.source] == 'V1'
+    assert spice._comp_map[dividers[1].top] == 'R.X2.R1'
+
+
+def test_hierarchical_alter():
+    board = Bench([1, 1, 2])
+    spice = NgSpice(board, 'GND', hierarchical=True)
+    spice.alter(board.dividers[1].top, 5000)
+    # The altered instance gets a definition of its own
+    assert spice.circuit.splitlines()[4:] == [
+        '.subckt divider_0 1',
+        'R1 1 2 5000',
+        'R2 2 0 1000.0',
+        '.ends divider_0',
+        '.subckt divider_1 1',
+        'R1 1 2 2000.0',
+        'R2 2 0 1000.0',
+        '.ends divider_1',
+        'V1 1 0 5',
+        'X1 1 divider',
+        'X2 1 divider_0',
+        'X3 1 divider_1',
+    ]
+    assert spice._comp_map[board.dividers[1].top] == 'R.X2.R1'
+    assert spice.get_dot_save([board.dividers[1].output]) == '.save X2.2'
+
+
+class Pair(Circuit):
+    # Two dividers in series, sharing their ground
+    def __init__(self):
+        super().__init__()
+        self.input = Net(name='input')
+        self.gnd = Net(name='gnd')
+        self.first = Divider()
+        self.second = Divider()
+        self.subcircuits['first'] = self.first
+        self.subcircuits['second'] = self.second
+        self.connections += [
+            (self.input, self.first.input),
+            (self.first.output, self.second.input),
+            (self.first.gnd, self.second.gnd, self.gnd),
+        ]
+
+
+def test_hierarchical_ports():
+    board = Board()
+    source = VoltageSource(5, name='source')
+    pair = Pair()
+    board.subcircuits['pair'] = pair
+    board.connections += [(source.p, pair.input), (source.n, pair.gnd)]
+    spice = NgSpice(board, source.n, hierarchical=True)
+    # The output of the first divider is a port of it, so the two dividers
+    # are instances of different definitions
+    assert spice.circuit.splitlines() == [
+        '.subckt divider 1 2',
+        'R1 1 2 1000.0',
+        'R2 2 0 1000.0',
+        '.ends divider',
+        '.subckt divider_0 1',
+        'R1 1 2 1000.0',
+        'R2 2 0 1000.0',
+        '.ends divider_0',
+        '.subckt pair 1',
+        'X1 1 2 divider',
+        'X2 2 divider_0',
+        '.ends pair',
+        'V1 1 0 5',
+        'X1 1 pair',
+    ]
+    assert spice.get_dot_save([pair.second.output, pair.first.output]) == '.save X1.X2.2 X1.2'
+    assert spice._comp_map[pair.second.bottom] == 'R.X1.X2.R2'
+
+
+def test_cache(tmp_path):
+    cache = SimulationCache(tmp_path / 'cache')
+    data = np.arange(10.0)
+    assert cache.get('deck') is None
+    cache.put('deck', data)
+    np.testing.assert_array_equal(cache.get('deck'), data)
+    assert cache.get('other deck') is None
+
+    # A file that can not be read is a miss
+    with open(cache._file('broken'), 'wb') as f:
+        f.write(b'not numpy')
+    assert cache.get('broken') is None
+
+
+def test_cache_eviction(tmp_path):
+    data = np.arange(10.0)
+    cache = SimulationCache(tmp_path, max_bytes=1 << 30)
+    cache.put('a', data)
+    size = os.path.getsize(cache._file('a'))
+    cache.max_bytes = 2 * size
+    cache.put('b', data)
+    os.utime(cache._file('a'), (1000, 1000))
+    os.utime(cache._file('b'), (2000, 2000))
+
+    # A hit makes 'a' the most recently used, so 'b' goes first
+    assert cache.get('a') is not None
+    cache.put('c', data)
+    assert cache.get('b') is None
+    assert cache.get('a') is not None and cache.get('c') is not None
+
+    os.utime(cache._file('a'), (3000, 3000))
+    cache.max_bytes = size
+    cache.evict()
+    assert sorted(os.listdir(tmp_path)) == [os.path.basename(cache._file('c'))]
+
+
+def test_simulate_cached(tmp_path, monkeypatch):
+    runs = []
+
+    def run(self, spice):
+        runs.append(spice)
+        return np.zeros(3, dtype=[('v-sweep', np.float64), ('v(1)', np.float64)])
+
+    monkeypatch.setattr(NgSpice, 'run', run)
+    board = Bench([1])
+    spice = NgSpice(board, 'GND', cache=tmp_path)
+    assert isinstance(spice.cache, SimulationCache)
+    sweep = [(board.source, (0, 5, 1))]
+    first = spice.dcsweep(sweep, trace=[board.dividers[0].output])
+    second = spice.dcsweep(sweep, trace=[board.dividers[0].output])
+    assert len(runs) == 1
+    np.testing.assert_array_equal(first[board.dividers[0].output], second[board.dividers[0].output])
+
+    # Any change to the deck is a miss
+    spice.alter(board.dividers[0].top, 2000)
+    spice.dcsweep(sweep, trace=[board.dividers[0].output])
+    assert len(runs) == 2
+
+    # and the cache is shared through its directory
+    NgSpice(board, 'GND', cache=tmp_path).dcsweep(sweep, trace=[board.dividers[0].output])
+    assert len(runs) == 2
+
+
+@pytest.fixture
+def ngspice(tmp_path, monkeypatch):
+    # Puts tests/fake_ngspice.py first on PATH and returns a function that
+    # reads the runs it logged
+    bin_dir = tmp_path / 'bin'
+    bin_dir.mkdir()
+    executable = bin_dir / 'ngspice'
+    fake = os.path.join(os.path.dirname(__file__), 'fake_ngspice.py')
+    executable.write_text(
+        f'#!{sys.executable}\nimport runpy\nrunpy.run_path({fake!r}, run_name="__main__")\n'
+    )
+    executable.chmod(0o755)
+    monkeypatch.setenv('PATH', f'{bin_dir}{os.pathsep}{os.environ["PATH"]}')
+    log = tmp_path / 'ngspice.log'
+    monkeypatch.setenv('FAKE_NGSPICE_LOG', str(log))
+
+    def runs():
+        if not log.exists():
+            return []
+        return [json.loads(line) for line in log.read_text().splitlines()]
+    return runs
+
+
+def test_batch(ngspice):
+    board = Bench([1])
+    spice = NgSpice(board, 'GND')
+    top = board.dividers[0].top
+    output = board.dividers[0].output
+    sweep = [(board.source, (0, 5, 1))]
+    results = spice.batch([{top: 1000}, {top: 2000}, {top: 3000}], 'dcsweep', sweep, trace=[output])
+    assert results[board.source].shape == results[output].shape == (3, 6)
+    np.testing.assert_array_equal(results[board.source][1], np.arange(6.0))
+    np.testing.assert_array_equal(results[output][:, 0], [1000, 2000, 3000])
+    assert len(ngspice()) == 3
+
+    results = spice.batch([], 'dcsweep', sweep, trace=[output])
+    assert results[board.source].shape == results[output].shape == (0, 0)
+    assert len(ngspice()) == 3
+
+
+def test_batch_transient(ngspice):
+    board = Bench([1])
+    spice = NgSpice(board, 'GND')
+    top = board.dividers[0].top
+    output = board.dividers[0].output
+    results = spice.batch([{top: 1000}, {top: 2000}], 'transient', 1, 10, trace=[output])
+    assert results['time'].shape == results[output].shape == (2, 11)
+    assert all('.options interp' in run['deck'] for run in ngspice())
+
+    # Only batches are interpolated
+    spice.transient(1, 10, trace=[output])
+    assert '.options interp' not in ngspice()[-1]['deck']
+
+
+def test_abatch(ngspice):
+    board = Bench([1])
+    spice = NgSpice(board, 'GND')
+    top = board.dividers[0].top
+    output = board.dividers[0].output
+    variants = [{top: 1000}, {top: 2000}, {top: 3000}]
+
+    async def collect(variants):
+        return [result async for result in spice.abatch(variants, 'dcsweep', [(board.source, (0, 5, 1))], trace=[output])]
+
+    results = asyncio.run(collect(variants))
+    assert sorted(index for index, result in results) == [0, 1, 2]
+    for index, result in results:
+        assert result[output].shape == (6,)
+        np.testing.assert_array_equal(result[output], variants[index][top])
+    assert asyncio.run(collect([])) == []
+
+
+def test_limiter(ngspice, monkeypatch):
+    monkeypatch.setenv('FAKE_NGSPICE_DELAY', '0.1')
+    board = Bench([1])
+    top = board.dividers[0].top
+
+    async def run():
+        spice = NgSpice(board, 'GND', limiter=asyncio.Semaphore(1))
+        variants = [{top: 1000}, {top: 2000}, {top: 3000}]
+        return [index async for index, result in spice.abatch(variants, 'transient', 1, 10, trace=['GND'])]
+
+    assert sorted(asyncio.run(run())) == [0, 1, 2]
+    runs = sorted((run['start'], run['end']) for run in ngspice())
+    assert len(runs) == 3
+    # One simulation at a time
+    assert all(end <= start for (_, end), (start, _) in zip(runs, runs[1:]))
+
+
+def test_raw_dir(ngspice, tmp_path):
+    raw_dir = tmp_path / 'raw'
+    raw_dir.mkdir()
+    board = Bench([1])
+    spice = NgSpice(board, 'GND', raw_dir=raw_dir)
+    output = board.dividers[0].output
+    result = spice.dcsweep([(board.source, (0, 5, 1))], trace=[output])
+    np.testing.assert_array_equal(result[output], np.full(6, 1000.0))
+    assert ngspice()[0]['argv'][:2] == ['-b', '-r']
+    assert list(raw_dir.iterdir()) == []
+
+
+def test_session(ngspice):
+    board = Bench([1])
+    top = board.dividers[0].top
+    output = board.dividers[0].output
+    sweep = [(board.source, (0, 5, 1))]
+    with NgSpice(board, 'GND', session=True) as spice:
+        assert spice.dcsweep(sweep, trace=[output])[output][0] == 1000
+        assert spice.dcsweep(sweep, trace=[output])[output][0] == 1000
+        spice.alter(top, 2000)
+        assert spice.dcsweep(sweep, trace=[output])[output][0] == 2000
+    # Stopped by close(), after one process loaded the circuit once
+    run, = ngspice()
+    assert run['argv'] == ['-p']
+    commands = run['commands']
+    assert [command.split()[0] for command in commands].count('source') == 1
+    assert 'alter R1 = 2000' in commands
+    assert commands[-1] == 'quit'
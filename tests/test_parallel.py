@@ -0,0 +1,73 @@
+import pickle
+from functools import partial
+
+import pytest
+
+from pypcb import Net, Board
+from pypcb.back.kicad import generate_netlist
+from pypcb.back.ngspice import NgSpice, VoltageSource
+from pypcb.erc import check
+from pypcb.lib.generic import Connector
+from pypcb.parallel import ElaboratedCircuit, elaborate
+
+from circuits import Divider
+
+
+class Panel(Board):
+    def __init__(self, dividers):
+        super().__init__()
+        conn = Connector(2, name='conn')
+        for i, divider in enumerate(dividers):
+            self.subcircuits[f'd{i}'] = divider
+            self.connections += [(divider.gnd, conn.p2, 'GND'), (divider.input, conn.p1)]
+
+
+def factories():
+    return [partial(Divider, ratio) for ratio in (1, 2, 1)]
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_elaborate(workers):
+    expected = Panel([factory() for factory in factories()])
+    board = Panel(elaborate(factories(), workers=workers))
+    assert generate_netlist(board) == generate_netlist(expected)
+    assert check(board.build(ir=True)) == check(expected.build(ir=True))
+
+
+def test_ports():
+    divider, = elaborate([Divider])
+    assert isinstance(divider, ElaboratedCircuit)
+    assert isinstance(divider.output, Net)
+    # Not connected in the divider
+    assert not hasattr(divider, 'spare')
+
+    copy = pickle.loads(pickle.dumps(divider))
+    board = Panel([copy])
+    netlist = board.build(ir=True)
+    assert netlist.components[0] is board.components._components['conn']
+    assert netlist.components[1:] == [None, None]
+    assert [netlist.strings[i] for i in netlist.component_path.tolist()] == [
+        '/conn', '/d0/top', '/d0/bottom',
+    ]
+
+
+def test_object_walks():
+    divider, = elaborate([Divider])
+    board = Board()
+    source = VoltageSource(5, name='source')
+    board.subcircuits['d'] = divider
+    board.connections += [(source.p, divider.input), (source.n, divider.gnd, 'GND')]
+    for walk in (board.get_nets, board.get_components, board.build):
+        with pytest.raises(RuntimeError):
+            walk()
+    with pytest.raises(RuntimeError):
+        NgSpice(board, 'GND', hierarchical=True)
+
+    # Simulated from the netlist IR
+    expected = Board()
+    flat_source = VoltageSource(5, name='source')
+    expected.subcircuits['d'] = flat = Divider()
+    expected.connections += [(flat_source.p, flat.input), (flat_source.n, flat.gnd, 'GND')]
+    spice = NgSpice(board, source.n)
+    assert spice.circuit == NgSpice(expected, 'GND').circuit
+    assert spice.get_dot_save([divider.output]) == NgSpice(expected, 'GND').get_dot_save([flat.output])